@@ -4,3 +4,7 @@
 # 
 # Use of this source code is governed by The MIT License (MIT)
 # that can be found in the LICENSE.txt file.
+
+"""Toolset for working with declarative plans."""
+
+__version__ = '0.1'
@@ -16,19 +16,49 @@ import sys
 import argparse
 import logging
 
-from gaplan.common.error import error, error_if, set_basename, set_options
+from gaplan.common.error import error, error_if, set_basename, set_options, \
+  record_warnings, replay_warnings
 import gaplan.common.interval as I
 import gaplan.common.printers as PR
+from gaplan.common import platform
 import gaplan.parse as PA
 import gaplan.wbs as WBS
 import gaplan.schedule as S
 import gaplan.estimator as E
+import gaplan.cache as C
+import gaplan.filter as F
+import gaplan.diff as D
 
 from gaplan.export import pert
 from gaplan.export import tj
 from gaplan.export import msp
 from gaplan.export import burn
 
+def _parse_plan(filename, text, W, cache):
+  """Parse plan, reusing results of previous runs if possible.
+     TEXT is plan contents (str or bytes-like)."""
+
+  if cache is not None:
+    key = cache.key(filename, text, W)
+    cached = cache.load(key)
+    if cached is not None:
+      deps, warnings, net, project, sched_plan = cached
+      # Included files may have changed since
+      if all(C.file_digest(dep) == digest for dep, digest in deps):
+        replay_warnings(warnings)
+        return net, project, sched_plan
+
+  with record_warnings() as warnings:
+    parser = PA.Parser()
+    parser.reset(filename, text)
+    net, project, sched_plan = parser.parse(W)
+
+  if cache is not None:
+    deps = [(dep, C.file_digest(dep)) for dep in parser.files[1:]]
+    cache.store(key, (deps, warnings, net, project, sched_plan))
+
+  return net, project, sched_plan
+
 def main():
   set_basename('gaplan')
 
@@ -47,6 +77,7 @@ ACTION should be one of
   burn      Print a burndown chart.
   msp       Convert declarative plan to MS Project project (TBD!).
   schedule  Generate simple schedule.
+  diff      Compare two versions of plan (PLAN and NEW_PLAN).
 
 Examples:
   Pretty print PERT diagram:
@@ -63,6 +94,16 @@ Examples:
   $ mkdir -p tjdir
   $ tj3 plan.tjp -o tjdir
 
+  Only process goals which are needed for milestone "Release":
+  $ {exe} --goal Release tj plan.txt
+
+  Only show high-priority goals which are assigned to backend team:
+  $ {exe} --filter 'prio >= 2 and @backend' pert plan.txt
+
+  Show what has changed in plan since last commit:
+  $ git show HEAD:plan.txt > old.txt
+  $ {exe} diff old.txt plan.txt
+
   Generate burndown chart:
   $ (echo 'set terminal png; {exe} --phase 'Iteration 1 completed' burndown plan.txt) | gnuplot - > burndown.png\
 """.format(exe='python -mgaplan'))
@@ -70,12 +111,17 @@ Examples:
     'action',
     metavar='ACT',
     help="Action performed on PLAN.",
-    choices=['dump', 'dump-wbs', 'tj', 'msp', 'pert', 'burn', 'burndown', 'schedule'])
+    choices=['dump', 'dump-wbs', 'tj', 'msp', 'pert', 'burn', 'burndown', 'schedule', 'diff'])
   parser.add_argument(
     'plan',
     metavar='PLAN',
     help="Path to declarative plan.",
     nargs='?')
+  parser.add_argument(
+    'new_plan',
+    metavar='NEW_PLAN',
+    help="Path to new version of plan (for diff).",
+    nargs='?')
   parser.add_argument(
     '-b', '--bias',
     help="Estimation bias.",
@@ -84,6 +130,18 @@ Examples:
   parser.add_argument(
     '--iter', '-i',
     help="Iteration to use for burndown chart.")
+  parser.add_argument(
+    '--goal', '-g',
+    help="Only process goal and goals it depends on "
+         "(schedule then ignores work on other goals).")
+  parser.add_argument(
+    '--depth',
+    help="Max. number of dependency levels processed with --goal.",
+    type=int)
+  parser.add_argument(
+    '--filter', '-f',
+    help="Only output goals which match expression "
+         "(e.g. 'prio >= 2 and @backend', see gaplan/filter.py for syntax).")
   parser.add_argument(
     '-W',
     help="Enable extra warnings.",
@@ -110,12 +168,30 @@ Examples:
          "(instead of passing them to external programs "
          "like Graphviz or TaskJuggler).",
     action='store_true')
+  parser.add_argument(
+    '--no-cache',
+    help="Do not reuse (or save) parsed plans from previous runs.",
+    dest='cache',
+    action='store_false',
+    default=True)
 
   args = parser.parse_args()
 
+  goal_filter = None if args.filter is None else F.compile_filter(args.filter)
+
   if args.iter is not None and args.action != 'burn':
     error("--iter/-i is only implemented for burndown charts")
 
+  error_if(args.depth is not None and args.goal is None, "--depth requires --goal")
+  error_if(args.depth is not None and args.depth < 0, "--depth must be non-negative")
+
+  if args.action == 'diff':
+    error_if(args.plan is None or args.new_plan is None,
+             "diff requires two plans")
+    error_if(args.goal is not None, "--goal is not supported for diff")
+  elif args.new_plan is not None:
+    error(f"unexpected argument '{args.new_plan}'")
+
   if args.bias is not None:
     try:
       bias = E.Bias[args.bias.upper().replace('-', '_')]
@@ -131,22 +207,47 @@ Examples:
 
   set_options(print_stack=args.print_stack)
 
+  cache = C.PlanCache() if args.cache else None
   if args.plan is None:
-    filename = '<stdin>'
-    f = sys.stdin
+    net, project, sched_plan = _parse_plan('<stdin>', sys.stdin.read(), args.W, cache)
   else:
-    filename = args.plan
-    f = open(filename, 'r')  # pylint: disable=consider-using-with
+    with platform.map_file(args.plan) as buf:
+      net, project, sched_plan = _parse_plan(args.plan, buf, args.W, cache)
 
-  parser = PA.Parser()
-  parser.reset(filename, f)
-  net, project, sched_plan = parser.parse(args.W)
+  if args.action == 'diff':
+    with platform.map_file(args.new_plan) as buf:
+      new_net, _, _ = _parse_plan(args.new_plan, buf, args.W, cache)
+    changes = D.diff(net, new_net)
+    if goal_filter is not None:
+      names = set()
+      for n in net, new_net:
+        names.update(g.name for g in goal_filter.select(n))
+      changes = [c for c in changes if c.name in names]
+    D.dump(changes, PR.SourcePrinter())
+    return
 
   if args.action in {'tj', 'msp'} and not project.members:
     error("--tj and --msp require member info in project file")
 
   net.check(args.W)
 
+  # Slice plan before doing any heavy work
+  if args.goal is not None:
+    goal = net.name_to_goal.get(args.goal)
+    error_if(goal is None, f"goal '{args.goal}' not found in plan")
+    net = net.subnet(net.slice(goal, args.depth))
+    sched_plan = sched_plan.restrict(net.name_to_goal)
+    if goal.name not in sched_plan.goal_names():
+      block = S.SchedBlock(False, 0, goal.loc)
+      block.add_goal(goal.name, [], goal.loc)
+      sched_plan.blocks.append(block)
+
+  full_net = net
+  if goal_filter is not None:
+    goals = goal_filter.select(net)
+    error_if(not goals, f"no goals match filter '{args.filter}'")
+    net = net.subnet(goals)
+
   wbs = WBS.create_wbs(net, args.hierarchy)
   p = PR.SourcePrinter()
 
@@ -164,12 +265,18 @@ Examples:
     wbs.dump(p)
   elif args.action == 'schedule':
     scheduler = S.Scheduler(estimator)
-    sched = scheduler.schedule(project, net, sched_plan)
+    # Schedule depends on all goals so restrict only the results
+    sched = scheduler.schedule(project, full_net, sched_plan)
+    if goal_filter is not None:
+      sched.restrict(net.goals)
     sched.dump(p)
   elif args.action in ('burn', 'burndown'):
     if args.iter is None:
       duration = project.duration
-      goal = net.roots[0]
+      # Target goal may be filtered out
+      goal = net.name_to_goal.get(args.goal) if args.goal is not None else None
+      if goal is None:
+        goal = net.roots[0]
     else:
       goals = net.iter_to_goals.get(args.iter)
       error_if(goals is None, f"iteration '{args.phase}' is not present in plan")
@@ -0,0 +1,8 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2022 Yury Gribov
+#
+# Use of this source code is governed by The MIT License (MIT)
+# that can be found in the LICENSE.txt file.
+
+"""Benchmarks for Gaplan pipeline (run with --help for details)."""
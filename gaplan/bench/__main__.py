@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+
+# The MIT License (MIT)
+#
+# Copyright (c) 2022 Yury Gribov
+#
+# Use of this source code is governed by The MIT License (MIT)
+# that can be found in the LICENSE.txt file.
+
+"""Benchmark driver for Gaplan.
+
+Run with --help for details.
+"""
+
+import sys
+import json
+import argparse
+import logging
+
+from gaplan.common.error import error, set_basename
+from gaplan.bench import synth
+from gaplan.bench import harness
+
+def _read_json(filename):
+  try:
+    with open(filename) as f:
+      return json.load(f)
+  except (OSError, ValueError) as e:
+    error(f"failed to read results from {filename}: {e}")
+
+def main():
+  set_basename('gaplan.bench')
+
+  class Formatter(argparse.ArgumentDefaultsHelpFormatter, argparse.RawDescriptionHelpFormatter):
+    pass
+  parser = argparse.ArgumentParser(
+    formatter_class=Formatter,
+    description="Time stages of Gaplan pipeline on synthetic (or user-provided) plans.",
+    epilog="""\
+Examples:
+  Benchmark plans with 1000 and 10000 goals:
+  $ {exe} --goals 1000,10000 -o new.json
+
+  Compare with results of older version:
+  $ {exe} --goals 1000,10000 --baseline old.json
+
+  Generate a plan for profiling:
+  $ {exe} --goals 100000 --generate-only > plan.txt\
+""".format(exe='python -mgaplan.bench'))
+  parser.add_argument(
+    'plans',
+    metavar='PLAN',
+    help="Also benchmark existing plan.",
+    nargs='*')
+  parser.add_argument(
+    '--goals',
+    help="Comma-separated list of synthetic plan sizes.",
+    default=str(synth.DEFAULTS['goals']))
+  for name, val in sorted(synth.DEFAULTS.items()):
+    if name != 'goals':
+      parser.add_argument(
+        f'--{name}',
+        help=f"Synthetic plan parameter '{name}'.",
+        type=int,
+        default=val)
+  parser.add_argument(
+    '--repeat', '-r',
+    help="Number of runs of each stage.",
+    type=int,
+    default=3)
+  parser.add_argument(
+    '--output', '-o',
+    help="Write results to file (instead of stdout).")
+  parser.add_argument(
+    '--baseline', '-b',
+    help="Compare results against previously saved ones.")
+  parser.add_argument(
+    '--threshold',
+    help="Slowdown (relative) which is considered a regression.",
+    type=float,
+    default=0.1)
+  parser.add_argument(
+    '--generate-only',
+    help="Print synthetic plan (for largest size) and exit.",
+    action='store_true')
+  parser.add_argument(
+    '--verbose', '-v',
+    help="Print diagnostic info.",
+    action='count',
+    default=0)
+
+  args = parser.parse_args()
+
+  v = min(2, args.verbose)
+  loglevel = logging.WARNING - 10 * v
+  logging.basicConfig(level=loglevel)
+
+  try:
+    sizes = [int(n) for n in args.goals.split(',') if n]
+  except ValueError:
+    error(f"invalid list of plan sizes: {args.goals}")
+
+  params = {name: getattr(args, name) for name in synth.DEFAULTS if name != 'goals'}
+
+  if args.generate_only:
+    sys.stdout.write(synth.generate(goals=max(sizes), **params))
+    return
+
+  results = []
+  for n in sizes:
+    text = synth.generate(goals=n, **params)
+    results.append(harness.run(f'synthetic-{n}', text, args.repeat,
+                               params=dict(params, goals=n)))
+  for plan in args.plans:
+    with open(plan) as f:
+      text = f.read()
+    results.append(harness.run(plan, text, args.repeat))
+
+  report = harness.make_report(results, args.repeat)
+
+  if args.output is None and args.baseline is None:
+    json.dump(report, sys.stdout, indent=2)
+    sys.stdout.write('\n')
+  elif args.output is not None:
+    with open(args.output, 'w') as f:
+      json.dump(report, f, indent=2)
+      f.write('\n')
+
+  if args.baseline is not None:
+    regressions = harness.compare(_read_json(args.baseline), report, args.threshold)
+    if regressions:
+      sys.exit(1)
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,181 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2022 Yury Gribov
+#
+# Use of this source code is governed by The MIT License (MIT)
+# that can be found in the LICENSE.txt file.
+
+"""Timing of Gaplan pipeline stages."""
+
+import io
+import sys
+import time
+import platform
+import contextlib
+import statistics
+import logging
+
+import gaplan
+from gaplan.common.error import record_warnings
+import gaplan.parse as PA
+import gaplan.wbs as WBS
+import gaplan.schedule as S
+import gaplan.estimator as E
+
+from gaplan.export import pert
+from gaplan.export import tj
+from gaplan.export import msp
+from gaplan.export import burn
+
+logger = logging.getLogger(__name__)
+
+# Version of result format
+FORMAT = 1
+
+# Pipeline stages in order of execution (each one gets results of previous ones)
+STAGES = ['parse', 'recompute', 'check', 'wbs', 'schedule',
+          'export-tj', 'export-pert', 'export-msp', 'export-burn']
+
+# Differences in timings below this (in seconds) are considered to be noise
+MIN_TIME = 0.001
+
+class _StageFailed(Exception):
+  pass
+
+def _time(fn, repeat):
+  """Runs FN REPEAT times, returns timings and result of last run."""
+  times = []
+  res = None
+  for _ in range(repeat):
+    start = time.perf_counter()
+    try:
+      # Exporters print results in dump mode
+      with contextlib.redirect_stdout(io.StringIO()):
+        res = fn()
+    except (Exception, SystemExit) as e:  # pylint: disable=broad-except
+      raise _StageFailed(f"{type(e).__name__}: {e}") from e
+    times.append(time.perf_counter() - start)
+  return times, res
+
+def run(name, text, repeat=3, W=1, params=None):
+  """Times all pipeline stages on a plan with contents TEXT.
+     Returns JSON-serializable dictionary."""
+
+  res = {
+    'plan': name,
+    'params': params,
+    'bytes': len(text),
+    'stages': {},
+  }
+
+  est = E.RiskBasedEstimator(E.Bias.NONE)
+  state = {}
+
+  def parse():
+    parser = PA.Parser()
+    parser.reset(name, text)
+    return parser.parse(W)
+
+  def export_burn():
+    net = state['net']
+    burn.export(net, net.roots[0], state['prj'].duration, True)
+
+  stages = {
+    'parse': parse,
+    'recompute': lambda: state['net']._recompute(W),  # pylint: disable=protected-access
+    'check': lambda: state['net'].check(W),
+    'wbs': lambda: WBS.create_wbs(state['net'], True),
+    'schedule': lambda: S.Scheduler(est).schedule(state['prj'], state['net'], state['sched_plan']),
+    'export-tj': lambda: tj.export(state['prj'], state['wbs'], est, True),
+    'export-pert': lambda: pert.export(state['net'], True),
+    'export-msp': lambda: msp.export(state['prj'], state['wbs'], True),
+    'export-burn': export_burn,
+  }
+  # Stages which need results of other stages
+  requires = {
+    'export-tj': 'wbs',
+    'export-msp': 'wbs',
+  }
+
+  with record_warnings(quiet=True) as warnings:
+    for stage in STAGES:
+      req = requires.get(stage, 'net')
+      if stage != 'parse' and req not in state:
+        res['stages'][stage] = {'error': f"skipped because '{req}' is not available"}
+        continue
+
+      logger.debug(f"run: running stage '{stage}' on {name}")
+      try:
+        times, val = _time(stages[stage], repeat)
+      except _StageFailed as e:
+        logger.debug(f"run: stage '{stage}' failed: {e}")
+        res['stages'][stage] = {'error': str(e)}
+        continue
+
+      res['stages'][stage] = {
+        'min': min(times),
+        'median': statistics.median(times),
+        'times': times,
+      }
+
+      if stage == 'parse':
+        state['net'], state['prj'], state['sched_plan'] = val
+      elif stage == 'recompute':
+        res['stages'][stage]['substages'] = dict(state['net'].timings)
+      elif stage == 'wbs':
+        state['wbs'] = val
+
+  res['warnings'] = len(warnings)
+  net = state.get('net')
+  if net is not None:
+    res['goals'] = len(net.name_to_goal)
+    res['activities'] = sum(len(g.preds) for g in set(net.name_to_goal.values()))
+
+  return res
+
+def make_report(results, repeat):
+  """Wraps results of run() into a report."""
+  return {
+    'format': FORMAT,
+    'gaplan': gaplan.__version__,
+    'python': platform.python_version(),
+    'implementation': platform.python_implementation(),
+    'machine': platform.machine(),
+    'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    'repeat': repeat,
+    'results': results,
+  }
+
+def compare(old, new, threshold=0.1, out=sys.stdout):
+  """Prints per-stage ratios of timings in two reports.
+     Returns number of stages which became slower by more than THRESHOLD."""
+
+  old_results = {r['plan']: r for r in old['results']}
+  regressions = 0
+  for r in new['results']:
+    old_r = old_results.get(r['plan'])
+    if old_r is None:
+      continue
+    out.write(f"{r['plan']}:\n")
+    for stage in STAGES:
+      new_s = r['stages'].get(stage, {})
+      old_s = old_r['stages'].get(stage, {})
+      if 'min' not in new_s or 'min' not in old_s:
+        old_str = f"{old_s['min']:9.4f}s" if 'min' in old_s else '   failed'
+        new_str = f"{new_s['min']:9.4f}s" if 'min' in new_s else '   failed'
+        mark = ''
+        if 'min' in old_s:
+          mark = '  REGRESSION'
+          regressions += 1
+        out.write(f"  {stage:12} {old_str} -> {new_str}{mark}\n")
+        if 'error' in new_s:
+          out.write(f"    {new_s['error']}\n")
+        continue
+      ratio = new_s['min'] / old_s['min'] if old_s['min'] else float('inf')
+      mark = ''
+      # Ignore noise in very short stages
+      if ratio > 1 + threshold and new_s['min'] - old_s['min'] > MIN_TIME:
+        mark = '  REGRESSION'
+        regressions += 1
+      out.write(f"  {stage:12} {old_s['min']:9.4f}s -> {new_s['min']:9.4f}s ({ratio:.2f}x){mark}\n")
+  return regressions
@@ -0,0 +1,159 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2022 Yury Gribov
+#
+# Use of this source code is governed by The MIT License (MIT)
+# that can be found in the LICENSE.txt file.
+
+"""Generator of synthetic declarative plans."""
+
+import random
+
+# Shape of generated plans, can be overriden via generate()'s arguments
+DEFAULTS = {
+  'goals': 1000,      # Total number of goals
+  'components': 10,   # Number of independent subnetworks (e.g. features)
+  'depth': 4,         # Max. nesting of goal definitions
+  'fanout': 3,        # Number of subgoals defined under each goal
+  'fanin': 1,         # Number of extra dependencies on goals from other subtrees
+  'checks': 2,        # Number of checks per goal
+  'members': 8,       # Number of developers
+  'teams': 2,         # Number of teams
+  'blocks': 4,        # Number of schedule blocks
+  'seed': 0,
+}
+
+# Estimates and dates are drawn from small pools, like in real plans
+_EFFORTS = ['1h', '2h-4h', '1d', '1d-2d', '2d-1w', '1w', '1w-2w', '2w-1m']
+_START = '2020-01-01'
+_FINISH = '2021-12-31'
+_DEADLINES = [f'2021-{m:02d}-{d:02d}' for m in range(1, 13) for d in (1, 15)]
+
+class _Generator:
+  """Emits text of synthetic plan."""
+
+  def __init__(self, params):
+    self.params = params
+    self.rng = random.Random(params['seed'])
+    self.lines = []
+    self.next_goal = 0
+
+  def _activity_attrs(self):
+    rng = self.rng
+    attrs = [rng.choice(_EFFORTS)]
+    if rng.random() < 0.5:
+      attrs.append(f"@dev{rng.randrange(self.params['members'])}")
+    elif self.params['teams']:
+      attrs.append(f"@team{rng.randrange(self.params['teams'])}")
+    return '  // ' + ', '.join(attrs)
+
+  def _goal_attrs(self, level):
+    rng = self.rng
+    attrs = []
+    if rng.random() < 0.1:
+      attrs.append(f'!{rng.randint(1, 3)}')
+    if rng.random() < 0.1:
+      attrs.append(f'?{rng.randint(1, 3)}')
+    if level == 0 and rng.random() < 0.3:
+      attrs.append(f'deadline {rng.choice(_DEADLINES)}')
+    return '  // ' + ', '.join(attrs) if attrs else ''
+
+  def _emit_goal(self, i, offset, level, last):
+    """Emit definition of goal I and (recursively) it's subgoals.
+       LAST is the last goal of current component."""
+    rng = self.rng
+    params = self.params
+    ind = ' ' * offset
+    self.lines.append(f'{ind}|Goal {i}{self._goal_attrs(level)}')
+    for k in range(params['checks']):
+      status = 'X' if rng.random() < 0.3 else ''
+      self.lines.append(f'{ind}|[{status}] Check {i}.{k}')
+
+    # Dependencies always point to goals with larger indices
+    # so generated network is acyclic
+
+    deps = set()
+
+    if level < params['depth']:
+      for _ in range(params['fanout']):
+        if self.next_goal > last:
+          break
+        j = self.next_goal
+        self.next_goal += 1
+        deps.add(j)
+        self.lines.append(f'{ind}|<-{self._activity_attrs()}')
+        self._emit_goal(j, offset + 3, level + 1, last)
+
+    for _ in range(params['fanin']):
+      if i >= last:
+        break
+      j = rng.randint(i + 1, last)
+      if j in deps:
+        continue
+      deps.add(j)
+      self.lines.append(f'{ind}|<-{self._activity_attrs()}')
+      self.lines.append(f'{ind}   |Goal {j}')
+
+  def _emit_project(self):
+    params = self.params
+    members = []
+    for k in range(params['members']):
+      if k % 3 == 1:
+        members.append(f'dev{k} (0.5)')
+      elif k % 5 == 2:
+        members.append(f'dev{k} (vacations 2020-06-01 - 2020-06-15)')
+      else:
+        members.append(f'dev{k}')
+    self.lines.append('name = Synthetic')
+    self.lines.append(f'start = {_START}')
+    self.lines.append(f'finish = {_FINISH}')
+    self.lines.append('members = ' + ', '.join(members))
+    teams = []
+    for t in range(params['teams']):
+      team_members = [f'dev{k}' for k in range(t, params['members'], params['teams'])]
+      teams.append(f"team{t} ({', '.join(team_members)})")
+    if teams:
+      self.lines.append('teams = ' + ', '.join(teams))
+    self.lines.append('')
+
+  def _emit_schedule(self, roots):
+    rng = self.rng
+    for b in range(self.params['blocks']):
+      if b % 2:
+        self.lines.append('--')
+      else:
+        self.lines.append(f'||  // deadline {rng.choice(_DEADLINES)}')
+      for i in rng.sample(roots, min(3, len(roots))):
+        self.lines.append(f'  |Goal {i}')
+      self.lines.append('')
+
+  def generate(self):
+    params = self.params
+    summary = ', '.join(f'{k} {v}' for k, v in sorted(params.items()))
+    self.lines.append('# Synthetic plan: ' + summary)
+    self.lines.append('')
+    self._emit_project()
+
+    roots = []
+    n = params['goals']
+    num_components = max(1, min(params['components'], n))
+    for c in range(num_components):
+      last = (c + 1) * n // num_components - 1
+      while self.next_goal <= last:
+        i = self.next_goal
+        self.next_goal += 1
+        roots.append(i)
+        self._emit_goal(i, 0, 0, last)
+        self.lines.append('')
+
+    self._emit_schedule(roots)
+    return '\n'.join(self.lines) + '\n'
+
+def generate(**kwargs):
+  """Returns text of synthetic plan. See DEFAULTS for supported arguments."""
+  params = dict(DEFAULTS)
+  for k, v in kwargs.items():
+    if k not in params:
+      raise TypeError(f"unknown plan parameter '{k}'")
+    params[k] = v
+  return _Generator(params).generate()
@@ -0,0 +1,135 @@
+# The MIT License (MIT)
+# 
+# Copyright (c) 2018-2022 Yury Gribov
+# 
+# Use of this source code is governed by The MIT License (MIT)
+# that can be found in the LICENSE.txt file.
+
+"""Persistent on-disk cache of parsed plans."""
+
+import os
+import os.path
+import hashlib
+import pickle
+import tempfile
+import logging
+
+import gaplan
+from gaplan.common import platform
+from gaplan.common.error import warn
+
+logger = logging.getLogger(__name__)
+
+# Total size of cache entries (in bytes)
+MAX_SIZE = 64 * 1024 * 1024
+
+_SUFFIX = '.pickle'
+
+# Version of pickled data, has to be bumped when layout
+# of goals, activities, etc. changes
+FORMAT = 8
+
+def file_digest(filename):
+  """Compute hash of file contents (None if file is missing)."""
+  h = hashlib.sha256()
+  try:
+    with open(filename, 'rb') as f:
+      h.update(f.read())
+  except OSError:
+    return None
+  return h.hexdigest()
+
+class PlanCache:
+  """Stores results of plan parsing, keyed by plan contents.
+
+     Least recently used entries are evicted once cache grows above size limit.
+  """
+
+  def __init__(self, path=None, max_size=MAX_SIZE):
+    self.path = path or platform.cache_dir('gaplan')
+    self.max_size = max_size
+
+  @staticmethod
+  def key(filename, text, W):
+    """Compute cache key for plan (TEXT is either str or bytes-like)."""
+    h = hashlib.sha256()
+    # Filename and warning level affect locations and diagnostics
+    # stored in parsed plan.
+    for s in (gaplan.__version__, str(FORMAT), filename, str(W)):
+      h.update(s.encode('utf-8'))
+      h.update(b'\0')
+    h.update(text.encode('utf-8') if isinstance(text, str) else text)
+    return h.hexdigest()
+
+  def _entry(self, key):
+    return os.path.join(self.path, key + _SUFFIX)
+
+  def load(self, key):
+    """Return cached value or None if not present."""
+    filename = self._entry(key)
+    try:
+      with open(filename, 'rb') as f:
+        value = pickle.load(f)
+    except FileNotFoundError:
+      logger.debug(f"load: cache miss for {key}")
+      return None
+    except Exception as e:  # pylint: disable=broad-except
+      logger.debug(f"load: dropping broken cache entry {filename}: {e}")
+      self._remove(filename)
+      return None
+    # Mark as recently used
+    try:
+      os.utime(filename)
+    except OSError:
+      pass
+    logger.debug(f"load: cache hit for {key}")
+    return value
+
+  def store(self, key, value):
+    """Save value to cache."""
+    try:
+      data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+    except (RecursionError, pickle.PicklingError) as e:
+      warn(f"unable to cache plan: {e}")
+      return
+    if len(data) > self.max_size:
+      return
+    try:
+      os.makedirs(self.path, exist_ok=True)
+      # Write to temp file and rename to avoid readers seeing partial entries
+      fd, tmp = tempfile.mkstemp(dir=self.path, suffix='.tmp')
+      with os.fdopen(fd, 'wb') as f:
+        f.write(data)
+      os.replace(tmp, self._entry(key))
+    except OSError as e:
+      logger.debug(f"store: failed to write cache entry: {e}")
+      return
+    self._evict()
+
+  def _remove(self, filename):
+    try:
+      os.remove(filename)
+    except OSError:
+      pass
+
+  def _evict(self):
+    """Remove least recently used entries until cache fits into size limit."""
+    entries = []
+    total = 0
+    with os.scandir(self.path) as it:
+      for e in it:
+        if not e.name.endswith(_SUFFIX):
+          continue
+        try:
+          st = e.stat()
+        except OSError:
+          continue
+        entries.append((st.st_mtime, st.st_size, e.path))
+        total += st.st_size
+    entries.sort()
+    for _, size, filename in entries:
+      if total <= self.max_size:
+        break
+      logger.debug(f"_evict: removing {filename}")
+      self._remove(filename)
+      total -= size
@@ -9,6 +9,8 @@
 
 import sys
 import os.path
+import contextlib
+import threading
 from typing import NoReturn
 
 from gaplan.common.location import Location
@@ -16,6 +18,13 @@ from gaplan.common.location import Location
 _print_stack = False
 _me = os.path.basename(sys.argv[0])
 
+class _WarningState(threading.local):
+  """Per-thread state of warning recorder."""
+  recorded = None
+  quiet = False
+
+_warnings = _WarningState()
+
 def error(*args) -> NoReturn:
   """Prints pretty error message and terminates."""
   if isinstance(args[0], Location):
@@ -37,10 +46,37 @@ def warn(*args):
   """Prints pretty warning message."""
   if isinstance(args[0], Location):
     loc, msg = args
-    sys.stderr.write(f"{_me}: warning: {loc}: {msg}\n")
+    text = f"{_me}: warning: {loc}: {msg}\n"
   else:
     msg, = args
-    sys.stderr.write(f"{_me}: warning: {msg}\n")
+    text = f"{_me}: warning: {msg}\n"
+  _emit_warning(text)
+
+def _emit_warning(text):
+  if not _warnings.quiet:
+    sys.stderr.write(text)
+  if _warnings.recorded is not None:
+    _warnings.recorded.append(text)
+
+@contextlib.contextmanager
+def record_warnings(quiet=False):
+  """Collects texts of warnings which were printed in scope
+     (so that they can be replayed later).
+     If quiet is set, warnings are collected but not printed."""
+  old, old_quiet = _warnings.recorded, _warnings.quiet
+  texts = _warnings.recorded = []
+  _warnings.quiet = quiet
+  try:
+    yield texts
+  finally:
+    _warnings.recorded, _warnings.quiet = old, old_quiet
+    if old is not None:
+      old.extend(texts)
+
+def replay_warnings(texts):
+  """Prints warnings previously collected via record_warnings."""
+  for text in texts:
+    _emit_warning(text)
 
 def warn_if(cond, *args):
   """Report warning if condition is true."""
@@ -7,11 +7,16 @@
 
 """Source file locations."""
 
+import sys
+
 class Location:
   """Location in file."""
 
+  __slots__ = ('filename', 'lineno')
+
   def __init__(self, filename=None, lineno=None):
-    self.filename = filename
+    # Locations are numerous so share their filenames
+    self.filename = sys.intern(filename) if isinstance(filename, str) else filename
     self.lineno = lineno
 
   def prior(self):
@@ -6,33 +6,45 @@
 # that can be found in the LICENSE.txt file.
 
 """A "regex cacher" which allows doing things like
-   if Re.match(...):
-     x = Re.group(1)
+   m = Matcher()
+   if m.match(...):
+     x = m.group(1)
 """
 
-# TODO: hols state in parent frames instead of global variable.
-
 import re
+import functools
+
+@functools.lru_cache(maxsize=None)
+def compile(pattern, flags=0):
+  """Compile pattern (compiled patterns are cached)."""
+  return re.compile(pattern, flags)
+
+class Matcher:
+  """Remembers last match result.
+
+     Matchers are cheap so a separate one should be created
+     in each function which needs it (this keeps code reentrant
+     and thread-safe)."""
+
+  __slots__ = ('last_match',)
 
-last_match = None
+  def __init__(self):
+    self.last_match = None
 
-def match(*args, **kwargs):
-  global last_match
-  last_match = re.match(*args, **kwargs)
-  return last_match
+  def match(self, pattern, string, flags=0):
+    self.last_match = compile(pattern, flags).match(string)
+    return self.last_match
 
-def search(*args, **kwargs):
-  global last_match
-  last_match = re.search(*args, **kwargs)
-  return last_match
+  def search(self, pattern, string, flags=0):
+    self.last_match = compile(pattern, flags).search(string)
+    return self.last_match
 
-def fullmatch(*args, **kwargs):
-  global last_match
-  last_match = re.fullmatch(*args, **kwargs)
-  return last_match
+  def fullmatch(self, pattern, string, flags=0):
+    self.last_match = compile(pattern, flags).fullmatch(string)
+    return self.last_match
 
-def group(*args, **kwargs):
-  return last_match.group(*args, *kwargs)
+  def group(self, *args):
+    return self.last_match.group(*args)
 
-def groups(*args, **kwargs):
-  return last_match.groups(*args, **kwargs)
+  def groups(self, *args):
+    return self.last_match.groups(*args)
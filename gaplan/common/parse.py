@@ -10,6 +10,8 @@
 import datetime
 import re
 import sys
+import mmap
+import functools
 
 from gaplan.common.error import error, error_if
 from gaplan.common.ETA import ETA
@@ -17,64 +19,112 @@ from gaplan.common.location import Location
 import gaplan.common.interval as I
 import gaplan.common.matcher as M
 
+# Max. number of memoized results of attribute parsers
+# (plans tend to reuse the same few hundred dates and estimates)
+CACHE_SIZE = 4096
+
+class _SyntaxError(Exception):
+  """Raised by memoized parsers, converted to error() by callers
+     (so that locations do not pollute cache keys)."""
+
 def read_fraction(s, loc):
-  if M.search(r'^[0-9.]+$', s):
+  m = M.Matcher()
+  if m.search(r'^[0-9.]+$', s):
     return float(s)
-  if M.search(r'^([0-9]+)%$', s):
-    return int(M.group(1)) / 100
+  if m.search(r'^([0-9]+)%$', s):
+    return int(m.group(1)) / 100
   error(loc, f"unexpected fraction syntax: {s}")
   raise ValueError("silly Pylint fails to understand NoReturn")
 
+_EFFORT_RE = re.compile(r'^\s*([0-9]+(?:\.[0-9]+)?)([hdwmy])\s*(.*)')
+_EFFORT_SCALES = {
+  'h': 1,
+  'd': 8,
+  'w': 5 * 8,  # Work week
+  'm': 22 * 8,  # Work month
+  'y': 12 * 22 * 8,  # Work year
+}
+
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def _parse_effort(s):
+  m = _EFFORT_RE.match(s)
+  if m is None:
+    raise _SyntaxError(f"failed to parse effort: {s}")
+  d = float(m.group(1)) * _EFFORT_SCALES[m.group(2)]
+  return int(round(d)), m.group(3)
+
 def read_effort(s, loc):
   """Parse effort estimate e.g. "1h" or "3d"."""
-  m = re.search(r'^\s*([0-9]+(?:\.[0-9]+)?)([hdwmy])\s*(.*)', s)
-  error_if(m is None, f"failed to parse effort: {s}")
-  d = float(m.group(1))
-  spec = m.group(2)
-  rest = m.group(3)
-  if spec == 'd':
-    d *= 8
-  elif spec == 'w':
-    d *= 5 * 8   # Work week
-  elif spec == 'm':
-    d *= 22 * 8   # Work month
-  elif spec == 'y':
-    d *= 12 * 22 * 8   # Work year
-  d = int(round(d))
-  return d, rest
+  try:
+    return _parse_effort(s)
+  except _SyntaxError as e:
+    error(loc, str(e))
 
-def read_eta(s, loc):
-  """Parse effort estimate e.g. "1h", "1h-3d" or "1h-3d (1d)"."""
+_ETA_ATTRS_RE = re.compile(r'^\s*\((.*)\)\s*$')
+_ETA_SEP_RE = re.compile(r'\s*,\s*')
+_ETA_REAL_RE = re.compile(r'^[0-9.]+[hdwmy]')
+_ETA_COMPLETION_RE = re.compile(r'^([0-9]+)%')
 
-  min, rest = read_effort(s, loc)
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def _parse_eta(s):
+  min, rest = _parse_effort(s)
 
   max = min
   if rest and rest[0] == '-':
-    max, rest = read_effort(rest[1:], loc)
+    max, rest = _parse_effort(rest[1:])
 
   real = None
   completion = 0
-  if M.search(r'^\s*\((.*)\)\s*$', rest):
-    for a in re.split(r'\s*,\s*', M.group(1)):
-      if re.search(r'^[0-9.]+[hdwmy]', a):
-        real, _ = read_effort(a, loc)
-      elif M.search(r'^([0-9]+)%', a):
-        completion = float(M.group(1)) / 100
-      else:
-        error(loc, f"unknown ETA attribute: {a}")
+  m = _ETA_ATTRS_RE.match(rest)
+  if m is not None:
+    for a in _ETA_SEP_RE.split(m.group(1)):
+      if _ETA_REAL_RE.match(a):
+        real, _ = _parse_effort(a)
+        continue
+      m_completion = _ETA_COMPLETION_RE.match(a)
+      if m_completion is None:
+        raise _SyntaxError(f"unknown ETA attribute: {a}")
+      completion = float(m_completion.group(1)) / 100
+
+  return min, max, real, completion
 
-  return ETA(min, max, real, completion)
+def read_eta(s, loc):
+  """Parse effort estimate e.g. "1h", "1h-3d" or "1h-3d (1d)"."""
+  try:
+    return ETA(*_parse_eta(s))
+  except _SyntaxError as e:
+    error(loc, str(e))
+
+# Fast path for common YYYY-MM-DD dates
+_ISO_DATE_RE = re.compile(r'^\s*([0-9]{4})-([0-9]{2})-([0-9]{2})(?![^-\s])\s*(.*)')
+_DATE_RE = re.compile(r'^\s*([^-\s]*-[^-\s]*)(-[^-\s]*)?\s*(.*)')
+
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def _parse_date(s):
+  m = _ISO_DATE_RE.match(s)
+  if m is not None:
+    try:
+      date = datetime.date(int(m.group(1)), int(m.group(2)), int(m.group(3)))
+      return date, m.group(4)
+    except ValueError:
+      # Let strptime report the error
+      pass
+  m = _DATE_RE.match(s)
+  if m is None:
+    raise _SyntaxError(f"failed to parse date: {s}")
+  date_str = m.group(1)
+  # If day is omitted, consider first day
+  date_str += m.group(2) or '-01'
+  return datetime.datetime.strptime(date_str, '%Y-%m-%d').date(), m.group(3)
 
 def read_date(s, loc):
   """Parse date duration e.g. "2020-01-10"."""
   # TODO: allow shorter formats (e.g. 'Jan 10')
   # but what if someone uses this in 2020?!
-  m = re.search(r'^\s*([^-\s]*-[^-\s]*)(-[^-\s]*)?\s*(.*)', s)
-  error_if(m is None, loc, f"failed to parse date: {s}")
-  date_str = m.group(1)
-  # If day is omitted, consider first day
-  date_str += m.group(2) or '-01'
-  return datetime.datetime.strptime(date_str, '%Y-%m-%d').date(), m.group(3)
+  try:
+    return _parse_date(s)
+  except _SyntaxError as e:
+    error(loc, str(e))
 
 def read_float(s, loc):
   """Parse float number."""
@@ -82,13 +132,21 @@ def read_float(s, loc):
   error_if(m is None, loc, f"failed to parse float: {s}")
   return float(m.group(1)), m.group(3)
 
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def _parse_date2(s):
+  start, rest = _parse_date(s)
+  finish = start
+  if rest and rest[0] == '-':
+    finish, rest = _parse_date(rest[1:])
+  return start, finish
+
 # TODO: parse UTC times i.e. 2015-02-01T12:00 ?
 def read_date2(s, loc):
   """Parse date duration e.g. "2015-02-01" or "2015-02-01 - 2015-02-03"."""
-  start, rest = read_date(s, loc)
-  finish = start
-  if rest and rest[0] == '-':
-    finish, rest = read_date(rest[1:], loc)
+  try:
+    start, finish = _parse_date2(s)
+  except _SyntaxError as e:
+    error(loc, str(e))
   return I.Interval(start, finish, True)
 
 def read_par(s):
@@ -96,23 +154,44 @@ def read_par(s):
   m = re.match(r'^\|\|(\s*([0-9]+))?$', s)
   return int(m.group(2) or sys.maxsize)
 
-def read_alloc(a, loc):
-  """Parse allocation directive e.g. "@dev1/dev2 (dev3)"."""
+_ALLOC_RE = re.compile(r'^@\s*(.*)')
+_REAL_ALLOC_RE = re.compile(r'^([^)]*)\)')
+
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def _parse_alloc(a):
   aa = a.split('(')
-  if len(aa) > 2 or not M.search(r'^@\s*(.*)', aa[0]):
-    error(loc, f"unexpected allocation syntax: {a}")
-  alloc = M.group(1).strip().split('/')
+  m = _ALLOC_RE.match(aa[0])
+  if len(aa) > 2 or m is None:
+    raise _SyntaxError(f"unexpected allocation syntax: {a}")
+  alloc = tuple(m.group(1).strip().split('/'))
   if len(aa) <= 1:
-    real_alloc = []
+    real_alloc = ()
   else:
-    if not M.search(r'^([^)]*)\)', a):
-      error(loc, f"unexpected allocation syntax: {a}")
-    real_alloc = M.group(1).strip().split('/')
+    m = _REAL_ALLOC_RE.match(a)
+    if m is None:
+      raise _SyntaxError(f"unexpected allocation syntax: {a}")
+    real_alloc = tuple(m.group(1).strip().split('/'))
   return alloc, real_alloc
 
+def read_alloc(a, loc):
+  """Parse allocation directive e.g. "@dev1/dev2 (dev3)"."""
+  try:
+    alloc, real_alloc = _parse_alloc(a)
+  except _SyntaxError as e:
+    error(loc, str(e))
+  # Return fresh lists as callers may modify them
+  return list(alloc), list(real_alloc)
+
+def clear_caches():
+  """Drop memoized results of attribute parsers."""
+  for fn in (_parse_effort, _parse_eta, _parse_date, _parse_date2, _parse_alloc):
+    fn.cache_clear()
+
 class Lexeme:
   """Represents parsed lexeme."""
 
+  __slots__ = ('type', 'data', 'text', 'loc')
+
   def __init__(self, type, data, text, loc):
     self.type = type
     self.data = data
@@ -122,13 +201,24 @@ class Lexeme:
   def __repr__(self):
     return f'{self.loc}: {self.type}: {self.data}'
 
+_decode_utf8 = functools.partial(str, encoding='utf-8')
+
 class BaseLexer:
   """Base class for lexers."""
 
   def __init__(self):
     self.lexemes = []
-    self.lines = []
-    self.filename = self.line = self.lineno = None
+    self.lines = self.buf = None
+    self.filename = self.lineno = None
+    # Current line is line[pos:end] (for buffered input line holds whole file)
+    self.line = ''
+    self.pos = self.end = 0
+    # Start of next line in buffer
+    self.buf_pos = 0
+    # Are we processing bytes (rather than str)?
+    self.binary = False
+    # Converts part of input to string
+    self.decode = str
 
   def _loc(self):
     return Location(self.filename, self.lineno)
@@ -141,11 +231,20 @@ class BaseLexer:
 
   # Override in children
   def reset(self, filename, lines):
-    """Resets lexer state."""
+    """Resets lexer state.
+
+       LINES is either an iterable of lines or a buffer
+       (str, bytes or mmap) which holds contents of whole file."""
     self.filename = filename
     self.lineno = 0
     self.line = ''
-    self.lines = lines
+    self.pos = self.end = self.buf_pos = 0
+    self.binary = False
+    self.decode = str
+    if isinstance(lines, (str, bytes, bytearray, mmap.mmap)):
+      self.buf, self.lines = lines, None
+    else:
+      self.buf, self.lines = None, lines
 
   # Override in children
   def update_on_newline(self):
@@ -155,12 +254,41 @@ class BaseLexer:
   def next_internal(self):
     return None
 
-  def __skip_empty(self):
-    while self.line == '' and self.lines:
-      next_line = next(self.lines, None)
+  def at_eol(self):
+    """Is current line exhausted?"""
+    return self.pos >= self.end
+
+  def rest(self):
+    """Unprocessed part of current line."""
+    return self.decode(self.line[self.pos:self.end])
+
+  def _next_line(self):
+    """Advance to next line of input (returns False if input is exhausted)."""
+    if self.buf is not None:
+      start = self.buf_pos
+      if start >= len(self.buf):
+        return False
+      self.line = self.buf
+      self.binary = not isinstance(self.buf, str)
+      end = self.buf.find(b'\n' if self.binary else '\n', start)
+      if end < 0:
+        end = len(self.buf)
+      self.buf_pos = end + 1
+    else:
+      next_line = next(self.lines, None) if self.lines else None
       if next_line is None:
-        break
+        return False
       self.line = next_line
+      self.binary = not isinstance(next_line, str)
+      start = 0
+      end = len(next_line)
+    self.pos = start
+    self.end = end
+    self.decode = _decode_utf8 if self.binary else str
+    return True
+
+  def __skip_empty(self):
+    while self.at_eol() and self._next_line():
       self.lineno += 1
       self.update_on_newline()
 
@@ -193,7 +321,7 @@ class BaseLexer:
     if l.type in type if isinstance(type, list) else l.type == type:
       self.skip()
       return l
-    raise ValueError("unreachable")
+    return None
 
   def expect(self, type):
     """Return current lexeme and advance if type matches."""
@@ -9,6 +9,8 @@
 
 import sys
 import os
+import mmap
+import contextlib
 
 from gaplan.common.error import error_if
 
@@ -21,3 +23,24 @@ def open_file(filename):
   else:
     rc = os.system(f'xdg-open {filename}')
   error_if(rc != 0, f"failed to open pdf file '{filename}'")
+
+def cache_dir(name):
+  """Returns per-user cache directory for application."""
+  if sys.platform.startswith('win'):
+    base = os.environ.get('LOCALAPPDATA') or os.path.expanduser('~')
+  else:
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache')
+  return os.path.join(base, name)
+
+@contextlib.contextmanager
+def map_file(filename):
+  """Map contents of file to memory (read-only)."""
+  with open(filename, 'rb') as f:
+    try:
+      buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except ValueError:
+      # Empty files can not be mapped
+      yield b''
+      return
+    with buf:
+      yield buf
@@ -0,0 +1,165 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2022 Yury Gribov
+#
+# Use of this source code is governed by The MIT License (MIT)
+# that can be found in the LICENSE.txt file.
+
+"""APIs for comparing two versions of declarative plan."""
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+class Change:
+  """Describes change of a single goal."""
+
+  ADDED = '+'
+  REMOVED = '-'
+  MODIFIED = '~'
+  MOVED = '>'
+
+  def __init__(self, kind, goal, details=None):
+    self.kind = kind
+    self.goal = goal
+    self.details = details or []
+
+  @property
+  def name(self):
+    return self.goal.name
+
+  def dump(self, p):
+    p.writeln(f"{self.kind} {self.goal.name} ({self.goal.loc})")
+    with p:
+      for d in self.details:
+        p.writeln(d)
+
+def _parent_name(g):
+  """Name of closest non-dummy ancestor of goal (dummy goals have no stable names)."""
+  p = g.parent
+  while p is not None and p.dummy:
+    p = p.parent
+  return None if p is None else p.name
+
+def _acts_by_source(g):
+  return {act.head.pretty_name if act.head else '': act
+          for act in g.preds + g.global_preds}
+
+def _compare_acts(old_g, new_g):
+  details = []
+  old_acts = _acts_by_source(old_g)
+  new_acts = _acts_by_source(new_g)
+  for name, act in new_acts.items():
+    old_act = old_acts.get(name)
+    what = f"dependency on '{name}'" if name else "activity"
+    if old_act is None:
+      details.append(f"added {what}")
+      continue
+    for attr, old_val, new_val in (
+        ('effort', str(old_act.effort), str(act.effort)),
+        ('alloc', '/'.join(old_act.alloc), '/'.join(act.alloc)),
+        ('actual alloc', '/'.join(old_act.real_alloc), '/'.join(act.real_alloc)),
+        ('duration', old_act.duration, act.duration),
+        ('parallel', old_act.parallel, act.parallel),
+        ('global', old_act.globl, act.globl)):
+      if old_val != new_val:
+        details.append(f"{what}: {attr} {old_val or 'none'} -> {new_val or 'none'}")
+  for name in old_acts:
+    if name not in new_acts:
+      what = f"dependency on '{name}'" if name else "activity"
+      details.append(f"removed {what}")
+  return details
+
+def _compare_checks(old_g, new_g):
+  details = []
+  old_checks = {c.name: c for c in old_g.checks}
+  new_names = set()
+  for c in new_g.checks:
+    new_names.add(c.name)
+    old_c = old_checks.get(c.name)
+    if old_c is None:
+      details.append(f"added check '{c.name}'")
+    elif old_c.status != c.status:
+      details.append(f"check '{c.name}': [{old_c.status}] -> [{c.status}]")
+  for c in old_g.checks:
+    if c.name not in new_names:
+      details.append(f"removed check '{c.name}'")
+  return details
+
+def _compare_goals(old_g, new_g):
+  """Returns list of differences in goal's own contents
+     (children are compared separately)."""
+  details = []
+  for attr in ('id', 'prio', 'risk', 'iter', 'deadline', 'completion_date'):
+    old_val = getattr(old_g, attr)
+    new_val = getattr(new_g, attr)
+    if old_val != new_val:
+      details.append(f"{attr}: {old_val} -> {new_val}")
+  if old_g.complete() != new_g.complete():
+    details.append(f"completion: {old_g.complete()}% -> {new_g.complete()}%")
+  details += _compare_checks(old_g, new_g)
+  details += _compare_acts(old_g, new_g)
+  return details
+
+def _walk_changed(net, other_net):
+  """Iterate over goals of NET (in hierarchical preorder)
+     skipping subtrees which are identical in OTHER_NET.
+     Yields goals and their counterparts in OTHER_NET (or None)."""
+  stack = list(reversed(net.roots))
+  while stack:
+    g = stack.pop()
+    other = None if g.dummy else other_net.name_to_goal.get(g.name)
+    if other is not None and other.content_hash == g.content_hash:
+      if _parent_name(other) != _parent_name(g):
+        yield g, other
+      # Unchanged subtree
+      continue
+    yield g, other
+    stack.extend(reversed(g.children))
+
+def diff(old, new):
+  """Compare two versions of plan. Returns list of changes
+     (ordered by position of goals in hierarchy of NEW plan,
+     removed goals go last)."""
+
+  old.compute_hashes()
+  new.compute_hashes()
+
+  changes = []
+  visited = 0
+
+  for g, old_g in _walk_changed(new, old):
+    visited += 1
+    if g.dummy:
+      continue
+    if old_g is None:
+      changes.append(Change(Change.ADDED, g))
+      continue
+    old_parent = _parent_name(old_g)
+    new_parent = _parent_name(g)
+    if old_parent != new_parent:
+      changes.append(Change(Change.MOVED, g,
+                            [f"moved from '{old_parent or '<top level>'}' "
+                             f"to '{new_parent or '<top level>'}'"]))
+    if old_g.content_hash != g.content_hash:
+      details = _compare_goals(old_g, g)
+      if details:
+        changes.append(Change(Change.MODIFIED, g, details))
+
+  for g, new_g in _walk_changed(old, new):
+    visited += 1
+    if not g.dummy and new_g is None:
+      changes.append(Change(Change.REMOVED, g))
+
+  logger.debug(f"diff: compared {visited} goals "
+               f"(out of {len(old.goals)} old and {len(new.goals)} new ones)")
+
+  return changes
+
+def dump(changes, p):
+  """Print list of changes."""
+  if not changes:
+    p.writeln("No changes")
+    return
+  for change in changes:
+    change.dump(p)
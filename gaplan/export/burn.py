@@ -16,6 +16,7 @@ import gaplan.goal as G
 import gaplan.common.printers as PR
 from gaplan.common.error import error
 from gaplan.common import platform
+import gaplan.rollup as R
 
 def export(net, goal, duration, dump):
   """Generate gnuplot chart for all children of goal within time interval."""
@@ -23,15 +24,15 @@ def export(net, goal, duration, dump):
   counts = defaultdict(int)
   counts[duration.start] = 0
   partial = [0]
-  total_children = [0]
   def scan_completed(g):
-    total_children[0] += 1   # TODO: skip milestones?
     if g.is_completed() and g.is_scheduled():
       counts[g.completion_date] += 1
     else:
       partial[0] += g.complete() / 100.0
   net.visit_goals([goal], callback=scan_completed, hierarchical=True)
 
+  total_children = R.of(net).subtree(goal).goals  # TODO: skip milestones?
+
   # Also count partially completed tasks
   today = datetime.date.today()
   if today < duration.finish:
@@ -61,7 +62,7 @@ set xrange ["{duration.start}":"{duration.finish}"]
 set xtics nomirror
 
 set ylabel "#Goals"
-set yrange [0:{total_children[0]}]
+set yrange [0:{total_children}]
 set ytics mirror
 
 plot "-" using 1:2 title 'Real' with lines, "-" using 1:2 title "Planned" with lines
@@ -69,11 +70,11 @@ plot "-" using 1:2 title 'Real' with lines, "-" using 1:2 title "Planned" with l
 
   for date in sorted_dates:
     n = counts[date]
-    left = total_children[0] - n
+    left = total_children - n
     p.writeln(f'  {date} {left}')
   p.writeln('e')
 
-  p.writeln(f'  {duration.start} {total_children[0]}')
+  p.writeln(f'  {duration.start} {total_children}')
   p.writeln(f'  {duration.finish} {0}')
   p.writeln('e')
 
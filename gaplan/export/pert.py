@@ -13,6 +13,7 @@ import io
 from gaplan.common.error import error
 import gaplan.common.printers as PR
 from gaplan.common import platform
+import gaplan.rollup as R
 
 def _get_node_colors(g):
   if g.is_completed():
@@ -21,13 +22,17 @@ def _get_node_colors(g):
     return 'red', 'black'
   return 'black', 'black'
 
-def _get_node_label(g, visible=False):
+def _get_node_label(g, visible=False, rollup=None):
   # Do not show fake names
   if g.dummy and visible:
     return ''
 
   caps = [g.name, ' (']
   caps.append(f'{g.complete()}%%')
+  if rollup is not None:
+    remaining = round(rollup.closure(g).remaining)
+    if remaining:
+      caps.append(f', {remaining}h left')
   if g.deadline:
     caps.append(', ' + g.deadline.strftime('%b %d'))
   caps.append(')')
@@ -37,10 +42,10 @@ def _get_node_label(g, visible=False):
 
   return ''.join(caps)
 
-def _print_node(g, p):
+def _print_node(g, p, rollup):
   box_color, text_color = _get_node_colors(g)
   label = _get_node_label(g)
-  text = _get_node_label(g, True)
+  text = _get_node_label(g, True, rollup)
   p.writeln(f'"{label}" [ label="{text}", color={box_color}, fontcolor={text_color} ];')
 
 def _print_node_edges(g, p):
@@ -69,9 +74,12 @@ def export(net, dump=False):
 #graph [rankdir = LR, concentrate = true]
 graph [rankdir = LR]
 ''')
-    net.visit_goals(callback=lambda g: _print_node(g, p))
+    rollup = R.of(net)
+    for g in net.iter_goals():
+      _print_node(g, p, rollup)
     p.writeln('')
-    net.visit_goals(callback=lambda g: _print_node_edges(g, p))
+    for g in net.iter_goals():
+      _print_node_edges(g, p)
   p.writeln('}')
 
   if dump:
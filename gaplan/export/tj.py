@@ -55,7 +55,8 @@ def _print_task(p, task, abs_ids, prj, est):
 
   act = task.act
   if act is not None:
-    _print_jira_links(p, act.tracker, prj)
+    if act.has_tracker():
+      _print_jira_links(p, act.tracker, prj)
 
     effort = act.effort.real
     # TODO: act.effort.completion
@@ -144,7 +145,6 @@ flags internal
 ''')
 
   # Print holidays
-  # TODO: additional holidays in plan
 
   for y in range(prj.start.year, prj.finish.year + 1):
     for name, dates in [
@@ -156,6 +156,9 @@ flags internal
         ('Independence day',  '06-12'),
         ('Unity day',         '11-04')]:
       p.writeln(f'leaves holiday "{name} {y}" {y}-{dates}')
+  # Holidays from plan (same calendar is used by scheduler)
+  for i, iv in enumerate(prj.calendar().holidays.ivs):
+    p.writeln(f'leaves holiday "Holiday {i + 1}" {iv.start} - {iv.finish}')
   p.writeln('')
 
   # Print resources
@@ -164,7 +167,7 @@ flags internal
   for dev in prj.members:
     p.writeln(f'  resource {dev.name} "{dev.name}" {{')
     p.writeln(f'    efficiency {dev.efficiency}')
-    for iv in dev.vacations:
+    for iv in prj.calendar(dev).holidays.ivs:
       p.writeln(f'    vacation {iv.start} - {iv.finish}')
     p.writeln('  }')
   p.writeln('}')
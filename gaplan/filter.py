@@ -0,0 +1,223 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2022 Yury Gribov
+#
+# Use of this source code is governed by The MIT License (MIT)
+# that can be found in the LICENSE.txt file.
+
+"""Filter expressions for selecting goals e.g. 'prio >= 2 and @backend'.
+
+Grammar:
+  expr   := term ('or' term)*
+  term   := factor ('and' factor)*
+  factor := 'not' factor | '(' expr ')' | atom
+  atom   := ATTR OP VALUE      (ATTR is prio, risk, iter or deadline)
+          | '@' NAME           (goal's activities are assigned to NAME)
+          | 'task' NAME        (goal is linked to tracker task)
+          | 'PR' NAME          (goal is linked to tracker PR, 'pr' is also accepted)
+          | 'pending'          (goal has pending checks)
+          | 'completed'
+  OP     := '==' | '=' | '!=' | '<' | '<=' | '>' | '>='
+
+Expressions are compiled to lookups in secondary indexes (see gaplan.index)
+so evaluation does not need to scan all goals.
+"""
+
+import re
+import bisect
+import datetime
+import operator
+
+from gaplan.common.error import error
+
+_TOKEN_RE = re.compile(r'\s*(?:([()])|(<=|>=|==|!=|<|>|=)|([^\s()<>=!]+))')
+
+_OPS = {
+  '==': operator.eq,
+  '=': operator.eq,
+  '!=': operator.ne,
+  '<': operator.lt,
+  '<=': operator.le,
+  '>': operator.gt,
+  '>=': operator.ge,
+}
+
+_KEYWORDS = {'and', 'or', 'not', '(', ')'}
+
+def _tokenize(text):
+  tokens = []
+  pos = 0
+  text = text.rstrip()
+  while pos < len(text):
+    m = _TOKEN_RE.match(text, pos)
+    if m is None or m.end() == pos:
+      error(f"invalid filter '{text}': unexpected character at position {pos}")
+    tokens.append(m.group(m.lastindex))
+    pos = m.end()
+  return tokens
+
+def _compare_ordered(attr, op, value):
+  """Compare attribute which is indexed via dictionary."""
+  def lookup(idx):
+    res = set()
+    for v, ids in getattr(idx, attr).items():
+      if op(v, value):
+        res.update(ids)
+    return res
+  return lookup
+
+def _compare_deadline(op, date):
+  def lookup(idx):
+    lo = bisect.bisect_left(idx.deadlines, date)
+    hi = bisect.bisect_right(idx.deadlines, date)
+    ids = idx.deadline_goals
+    if op is operator.eq:
+      return set(ids[lo:hi])
+    if op is operator.ne:
+      return set(ids[:lo]) | set(ids[hi:])
+    if op is operator.lt:
+      return set(ids[:lo])
+    if op is operator.le:
+      return set(ids[:hi])
+    if op is operator.gt:
+      return set(ids[hi:])
+    return set(ids[lo:])
+  return lookup
+
+def _lookup_key(attr, key):
+  """Find goals which have KEY in dictionary index."""
+  return lambda idx: set(getattr(idx, attr).get(key, ()))
+
+class _Parser:
+  """Recursive-descent parser of filter expressions."""
+
+  def __init__(self, text):
+    self.text = text
+    self.tokens = _tokenize(text)
+    self.pos = 0
+
+  def _error(self, msg):
+    error(f"invalid filter '{self.text}': {msg}")
+
+  def _peek(self):
+    return self.tokens[self.pos] if self.pos < len(self.tokens) else None
+
+  def _next(self, what):
+    tok = self._peek()
+    if tok is None:
+      self._error(f"expected {what} at end of expression")
+    self.pos += 1
+    return tok
+
+  def parse(self):
+    fn = self._expr()
+    if self._peek() is not None:
+      self._error(f"unexpected '{self._peek()}'")
+    return fn
+
+  def _expr(self):
+    fns = [self._term()]
+    while self._peek() == 'or':
+      self.pos += 1
+      fns.append(self._term())
+    if len(fns) == 1:
+      return fns[0]
+    return lambda idx: set().union(*(fn(idx) for fn in fns))
+
+  def _term(self):
+    fns = [self._factor()]
+    while self._peek() == 'and':
+      self.pos += 1
+      fns.append(self._factor())
+    if len(fns) == 1:
+      return fns[0]
+    def intersect(idx):
+      res = fns[0](idx)
+      for fn in fns[1:]:
+        if not res:
+          break
+        res &= fn(idx)
+      return res
+    return intersect
+
+  def _factor(self):
+    tok = self._next("expression")
+    if tok.startswith('@'):
+      if len(tok) == 1:
+        self._error("missing assignee name after '@'")
+      return _lookup_key('by_alloc', tok[1:])
+    parse = _Parser._FACTORS.get(tok)
+    if parse is None:
+      if tok in _KEYWORDS:
+        self._error(f"unexpected '{tok}'")
+      self._error(f"unknown filter '{tok}'")
+    return parse(self, tok)
+
+  def _negation(self, _):
+    fn = self._factor()
+    return lambda idx: set(range(len(idx.goals))) - fn(idx)
+
+  def _parens(self, _):
+    fn = self._expr()
+    if self._next("')'") != ')':
+      self._error("expected ')'")
+    return fn
+
+  def _task(self, _):
+    return _lookup_key('by_task', self._next("task name"))
+
+  def _pr(self, _):
+    return _lookup_key('by_pr', self._next("PR name"))
+
+  def _status(self, tok):
+    return lambda idx: set(getattr(idx, tok))
+
+  def _comparison(self, tok):
+    op = _OPS.get(self._next("comparison"))
+    if op is None:
+      self._error(f"expected comparison after '{tok}'")
+    value = self._next("value")
+    if tok == 'deadline':
+      try:
+        date = datetime.datetime.strptime(value, '%Y-%m-%d').date()
+      except ValueError:
+        self._error(f"invalid date '{value}'")
+      return _compare_deadline(op, date)
+    if tok == 'iter' and value.startswith('I'):
+      value = value[1:]
+    try:
+      value = int(value)
+    except ValueError:
+      self._error(f"invalid value '{value}' for '{tok}'")
+    return _compare_ordered('by_' + tok, op, value)
+
+  # Parsers of factors which start with given keyword
+  _FACTORS = {
+    'not': _negation,
+    '(': _parens,
+    'task': _task,
+    'PR': _pr,
+    'pr': _pr,
+    'pending': _status,
+    'completed': _status,
+    'prio': _comparison,
+    'risk': _comparison,
+    'iter': _comparison,
+    'deadline': _comparison,
+  }
+
+class Filter:
+  """Compiled filter expression."""
+
+  def __init__(self, text):
+    self.text = text
+    self._lookup = _Parser(text).parse()
+
+  def select(self, net):
+    """Returns goals of NET which match filter (in order of Net.goals)."""
+    ids = self._lookup(net.index())
+    return [net.goals[i] for i in sorted(ids)]
+
+def compile_filter(text):
+  """Parse filter expression (see module docstring for syntax)."""
+  return Filter(text)
@@ -10,8 +10,7 @@
 import sys
 import re
 import datetime
-import operator
-import copy
+import hashlib
 from enum import IntEnum
 
 from gaplan.common.error import error, warn, error_if, warn_if
@@ -42,25 +41,44 @@ class Risk(IntEnum):
 def add_common_attrs(loc, obj, attrs):
   """Adds attributes that are common for goals, checks and activities."""
 
+  m = M.Matcher()
   other_attrs = []
   for a in attrs:
-    if M.search(r'^([A-Za-z][A-Za-z0-9_]*)\s*(.*)', a):
-      k = M.group(1).strip()
-      #v = M.group(2).strip()
+    if m.search(r'^([A-Za-z][A-Za-z0-9_]*)\s*(.*)', a):
+      k = m.group(1).strip()
+      v = m.group(2).strip()
       if k == 'task':
-        obj.tracker.tasks = set(M.group(1).split('/'))
+        obj.tracker.tasks = set(v.split('/'))
         continue
       if k == 'PR':
-        obj.tracker.prs = set(M.group(1).split('/'))
+        obj.tracker.prs = set(v.split('/'))
         continue
 
     other_attrs.append(a)
 
   return other_attrs
 
+def _new_hash():
+  return hashlib.blake2b(digest_size=16)
+
+def _hash_values(h, *values):
+  """Add values to content hash (see Goal.content_hash).
+     Values need to have stable string representation."""
+  for v in values:
+    h.update(str(v).encode('utf-8'))
+    h.update(b'\0')
+
+def _hash_tracker(h, obj):
+  if obj.has_tracker():
+    _hash_values(h, sorted(obj.tracker.tasks), sorted(obj.tracker.prs))
+  else:
+    _hash_values(h, None)
+
 class TrackerLink:
   """Contains info about tasks and PRs in external tracker."""
 
+  __slots__ = ('tasks', 'prs')
+
   def __init__(self):
     self.tasks = set()
     self.prs = set()
@@ -72,16 +90,37 @@ class TrackerLink:
     if self.prs:
       p.writeln('PRs: ' + ', '.join(self.prs))
 
-class Condition:
+class _Tracked:
+  """Base class for objects which can be linked to external tracker."""
+
+  __slots__ = ('_tracker',)
+
+  def __init__(self):
+    # Most objects have no links so TrackerLink is allocated on demand
+    self._tracker = None
+
+  @property
+  def tracker(self):
+    if self._tracker is None:
+      self._tracker = TrackerLink()
+    return self._tracker
+
+  def has_tracker(self):
+    """Has object been linked to external tracker?"""
+    return self._tracker is not None
+
+class Condition(_Tracked):
   """Class which describes single completion condition of a goal."""
 
+  __slots__ = ('name', 'loc', 'status')
+
   def __init__(self, name, status, loc):
+    super().__init__()
     self.name = name
-    self.loc = copy.copy(loc)
+    self.loc = loc
 
     # Other
     self.status = status
-    self.tracker = TrackerLink()
 
   def add_attrs(self, attrs, loc):
     attrs = add_common_attrs(loc, self, attrs)
@@ -91,11 +130,15 @@ class Condition:
     """Is Condition completed?"""
     return self.status != ''
 
-class Activity:
+class Activity(_Tracked):
   """Class which describes an activity i.e. edge between two goals."""
 
+  __slots__ = ('loc', 'id', 'head', 'tail', 'globl',
+               'duration', 'effort', 'alloc', 'real_alloc', 'parallel', 'overlaps')
+
   def __init__(self, loc):
-    self.loc = copy.copy(loc)
+    super().__init__()
+    self.loc = loc
 
     # Deps
     self.id = None
@@ -111,9 +154,6 @@ class Activity:
     self.parallel = 1
     self.overlaps = {}
 
-    # Other
-    self.tracker = TrackerLink()
-
   def set_endpoints(self, g1, g2, is_pred):
     # Discriminate between "|<-" and "|->" edges
     if is_pred:
@@ -135,7 +175,17 @@ class Activity:
     """Does action have zero effort?"""
     return self.effort.real is None and self.effort.min is None
 
+  def update_hash(self, h):
+    """Add activity's contents to hash of it's target goal."""
+    _hash_values(h, self.id, self.globl,
+                 self.head.pretty_name if self.head else None,
+                 self.effort.min, self.effort.max, self.effort.real, self.effort.completion,
+                 self.alloc, self.real_alloc, self.duration, self.parallel,
+                 sorted(self.overlaps.items()))
+    _hash_tracker(h, self)
+
   def add_attrs(self, attrs, loc):
+    m = M.Matcher()
     attrs = add_common_attrs(loc, self, attrs)
 
     for a in attrs:
@@ -149,16 +199,16 @@ class Activity:
         continue
 
       # TODO: specify in effort attribute?
-      if M.search(r'^[0-9]{4}-', a):
+      if m.search(r'^[0-9]{4}-', a):
         self.duration = PA.read_date2(a, loc)
         continue
 
-      if M.match(r'^id\s+(.*)', a):
-        self.id = M.group(1)
+      if m.match(r'^id\s+(.*)', a):
+        self.id = m.group(1)
 
-      if M.match(r'over\s+(\S+)\s+(.*)', a):
-        other_id = M.group(1)
-        overlap, a = PA.read_float(M.group(2), loc)
+      if m.match(r'over\s+(\S+)\s+(.*)', a):
+        other_id = m.group(1)
+        overlap, a = PA.read_float(m.group(2), loc)
         if a == '%':
           overlap /= 100
         self.overlaps[other_id] = overlap
@@ -167,10 +217,10 @@ class Activity:
         self.parallel = PA.read_par(a)
         continue
 
-      if not M.search(r'^([a-z_0-9]+)\s*(.*)', a):
+      if not m.search(r'^([a-z_0-9]+)\s*(.*)', a):
         error(loc, f"failed to parse attribute: {a}")
-      k = M.group(1).strip()
-      #v = M.group(2).strip()
+      k = m.group(1).strip()
+      #v = m.group(2).strip()
 
       if k == 'global':
         self.globl = True
@@ -201,7 +251,8 @@ class Activity:
 
     p.writeln(f"Defined in {self.loc}")
 
-    self.tracker.dump(p)
+    if self.has_tracker():
+      self.tracker.dump(p)
 
     p.writeln(f"effort: {self.effort}")
 
@@ -223,12 +274,25 @@ class Activity:
 
     p.exit()
 
-class Goal:
+# Activity lists of goal which are longer than this
+# are indexed for fast lookup
+_ACT_INDEX_MIN = 16
+
+class Goal(_Tracked):
   """Class which describes a single goal in plan."""
 
+  __slots__ = ('name', 'loc', 'dummy', 'id', 'checks',
+               'preds', 'global_preds', 'succs', 'global_succs',
+               'parent', 'children', 'depth',
+               'deadline', 'completion_date', 'iter',
+               'defined', '_risk', '_prio', 'index',
+               '_complete', '_priority', '_pretty_name', '_act_index',
+               'content_hash')
+
   def __init__(self, name, loc, dummy=False):
+    super().__init__()
     self.name = name
-    self.loc = copy.copy(loc)
+    self.loc = loc
     self.dummy = dummy
     self.id = None
 
@@ -255,17 +319,95 @@ class Goal:
     self.defined = False
     self.risk = None
     self.prio = None
-    self.tracker = TrackerLink()
+    # Dense index of goal in network (see index_goals)
+    self.index = None
+
+    # Memoized derived values (None if not yet computed),
+    # see invalidate()
+    self._complete = None
+    self._priority = None
+    self._pretty_name = None
+
+    # Sets of activities for long activity lists (see add_activity)
+    self._act_index = None
+
+    # Hash of goal's contents and contents of it's children
+    # (see Net.compute_hashes)
+    self.content_hash = None
+
+  def __copy__(self):
+    # Shallow copy which does not share index of activity lists
+    # (lists themselves are usually replaced in copy, see Net.subnet)
+    g = Goal.__new__(type(self))
+    for attr in _Tracked.__slots__ + Goal.__slots__:
+      setattr(g, attr, None if attr == '_act_index' else getattr(self, attr))
+    return g
+
+  def invalidate(self):
+    """Drop memoized values of complete(), priority() and pretty_name.
+       Has to be called if checks or dependencies of goal are modified
+       directly (rather than via add_check, add_activity, etc.)."""
+    stack = [self]
+    while stack:
+      g = stack.pop()
+      # Names of dummy successors depend on name of dummy goal
+      # (they can only be cached if our name is)
+      if g.reset_memo() and g.dummy:
+        for act in g.succs:
+          if act.tail is not None and act.tail.dummy:
+            stack.append(act.tail)
+
+  def reset_memo(self):
+    """Drop memoized values of this goal only (see invalidate).
+       Returns whether pretty name was memoized."""
+    cached_name = self._pretty_name is not None
+    self._complete = self._priority = self._pretty_name = None
+    return cached_name
+
+  @property
+  def prio(self):
+    return self._prio
+
+  @prio.setter
+  def prio(self, prio):
+    self._prio = prio
+    self._priority = None
+
+  @property
+  def risk(self):
+    return self._risk
+
+  @risk.setter
+  def risk(self, risk):
+    self._risk = risk
+    self._priority = None
 
   def add_activity(self, act, is_pred):
-    # TODO: check if activity is already present to avoid dups
-    lst = None
-    if is_pred and act not in self.preds:
+    """Add activity to goal's predecessors or successors
+       (unless already present)."""
+    if is_pred:
       lst = self.global_preds if act.globl else self.preds
-    elif not is_pred and act not in self.succs:
+    else:
       lst = self.global_succs if act.globl else self.succs
-    if lst is not None:
-      lst.append(act)
+
+    if len(lst) < _ACT_INDEX_MIN:
+      if act in lst:
+        return
+    else:
+      # Long lists (e.g. in milestones) are indexed to avoid quadratic slowdown
+      if self._act_index is None:
+        self._act_index = {}
+      key = (is_pred, act.globl)
+      acts = self._act_index.get(key)
+      if acts is None:
+        acts = self._act_index[key] = set(lst)
+      if act in acts:
+        return
+      acts.add(act)
+
+    lst.append(act)
+    if is_pred:
+      self.invalidate()
 
   def is_scheduled(self):
     """Does goal have assigned dates?"""
@@ -277,8 +419,29 @@ class Goal:
 
   def add_check(self, check):
     self.checks.append(check)
+    self._complete = None
+
+  def merge(self, other):
+    """Merge info from other instance of the same goal (e.g. from different file)."""
+    for attr in ('id', 'prio', 'risk', 'iter', 'deadline', 'completion_date', 'parent'):
+      v = getattr(other, attr)
+      if v is not None:
+        setattr(self, attr, v)
+    if other.has_tracker():
+      self.tracker.tasks |= other.tracker.tasks
+      self.tracker.prs |= other.tracker.prs
+    self.checks += other.checks
+    self.preds += other.preds
+    self.global_preds += other.global_preds
+    self.succs += other.succs
+    self.global_succs += other.global_succs
+    self.children += other.children
+    self.defined = self.defined or other.defined
+    self._act_index = None
+    self.invalidate()
 
   def add_attrs(self, attrs, loc):
+    m = M.Matcher()
     attrs = add_common_attrs(loc, self, attrs)
 
     for a in attrs:
@@ -296,18 +459,18 @@ class Goal:
           error(loc, f"invalid risk value: {a}")
         continue
 
-      if M.search(r'^I[0-9]+$', a):
+      if m.search(r'^I[0-9]+$', a):
         self.iter = int(a[1:])
         continue
 
-      if M.search(r'^[0-9]{4}-', a):
+      if m.search(r'^[0-9]{4}-', a):
         self.completion_date, _ = PA.read_date(a, loc)
         continue
 
-      if not M.search(r'^([a-z_0-9]+)\s*(.*)', a):
+      if not m.search(r'^([a-z_0-9]+)\s*(.*)', a):
         error(loc, f"failed to parse goal attribute: {a}")
-      k = M.group(1).strip()
-      v = M.group(2).strip()
+      k = m.group(1).strip()
+      v = m.group(2).strip()
 
       if k == 'deadline':
         self.deadline, _ = PA.read_date(v, loc)
@@ -324,11 +487,13 @@ class Goal:
     """Return readable goal name (needed for dummy goals)."""
     if not self.dummy:
       return self.name
-    names = []
-    for pred in self.preds:
-      if pred.head:
-        names.append(pred.head.pretty_name)
-    return ', '.join(names)
+    if self._pretty_name is None:
+      names = []
+      for pred in self.preds:
+        if pred.head:
+          names.append(pred.head.pretty_name)
+      self._pretty_name = ', '.join(names)
+    return self._pretty_name
 
   def parents(self):
     ps = []
@@ -341,6 +506,11 @@ class Goal:
 
   def priority(self):
     """Combined priority which uses both risk and assigned priority."""
+    if self._priority is None:
+      self._priority = self._compute_priority()
+    return self._priority
+
+  def _compute_priority(self):
     prio = None if self.prio is None else Priority.rel(self.prio)
     risk = None if self.risk is None else Risk.rel(self.risk)
     if prio is not None and risk is not None:
@@ -355,10 +525,15 @@ class Goal:
 
   def complete(self):
     """Estimate goal completion percentage."""
-
+    # Completion date is checked before memoized value
+    # so that it can be assigned directly
     if self.completion_date is not None:
       return 100
+    if self._complete is None:
+      self._complete = self._compute_complete()
+    return self._complete
 
+  def _compute_complete(self):
     # If goal underspecified, return 0 to be conservative
     if not self.checks:
       return 0
@@ -389,38 +564,9 @@ class Goal:
 
   def visit(self, visited=None, **args):
     """Visitor pattern of goal network.
-       Supports both hierarchical and dependency-based traversals."""
-
-    if visited is None:
-      visited = set()
-
-    if self.name in visited:
-      return
-
-    visited.add(self.name)
-
-    before = args.get('before', args.get('callback', None))
-    after = args.get('after', None)
-
-    if before is not None:
-      before(self)
-
-    if args.get('hierarchical', False):
-      for g in self.children:
-        g.visit(visited, **args)
-    else:
-      if args.get('preds', True):
-        for act in self.preds:
-          if act.head:
-            act.head.visit(visited, **args)
-
-      if args.get('succs', True):
-        for act in self.succs:
-          if act.tail:
-            act.tail.visit(visited, **args)
-
-    if after is not None:
-      after(self)
+       Supports both hierarchical and dependency-based traversals.
+       VISITED is a set of names of already visited goals."""
+    visit_goals([self], set() if visited is None else visited, **args)
 
   def check(self, W):
     """Verify invariants."""
@@ -459,7 +605,33 @@ class Goal:
              f"goal '{self.name}' is achieved but "
              f"one of it's actions is missing tracking data")
 
-  def dump(self, p):
+  def dump(self, p, rollup=None):
+    # Iterative to support deep hierarchies: stack contains goals,
+    # labels of children and numbers of nested blocks to exit
+    stack = [self]
+    while stack:
+      item = stack.pop()
+      if isinstance(item, int):
+        for _ in range(item):
+          p.exit()
+      elif isinstance(item, str):
+        p.write(item)
+        p.enter()
+      else:
+        item._dump_attrs(p, rollup)  # pylint: disable=protected-access
+        if item.children:
+          p.writeln(f"{len(item.children)} child(ren):")
+          p.enter()
+          stack.append(2)
+          for i, g in reversed(list(enumerate(item.children))):
+            stack.append(1)
+            stack.append(g)
+            stack.append(f"#{i}:")
+        else:
+          stack.append(1)
+
+  def _dump_attrs(self, p, rollup):
+    """Dump everything except children (leaves block of goal open)."""
     p.writeln(self.name + (' (dummy)' if self.dummy else ''))
 
     p.enter()
@@ -481,7 +653,8 @@ class Goal:
       if v is not None:
         p.writeln(f"{name}: {v}")
 
-    self.tracker.dump(p)
+    if self.has_tracker():
+      self.tracker.dump(p)
 
     if self.checks:
       p.writeln(f"{len(self.checks)} check(s):")
@@ -489,6 +662,9 @@ class Goal:
         for check in self.checks:
           p.writeln(f"[{check.status}] {check.name}")
 
+    if rollup is not None and self.index is not None:
+      p.writeln(f"total work: {rollup.closure(self)}")
+
     if self.preds:
       p.writeln(f"{len(self.preds)} preceeding activity(s):")
       with p:
@@ -515,184 +691,258 @@ class Goal:
 
     parents = self.parents()
     if parents:
-      p.writeln(f"{len(self.parents)} parent(s):")
+      p.writeln(f"{len(parents)} parent(s):")
       with p:
         for g in parents:
           p.writeln(f'* {g.name}')
 
-    if self.children:
-      p.writeln(f"{len(self.children)} child(ren):")
-      with p:
-        for i, g in enumerate(self.children):
-          p.write(f"#{i}:")
-          with p:
-            g.dump(p)
-
-    p.exit()
-
-class Net:
-
-  """Class which represents a single declarative plan (goals, iterations, etc.)."""
-
-  def __init__(self, roots, W, loc):
-    self.roots = roots
-    self.loc = loc
-    self.name_to_goal = {}
-    self.iter_to_goals = {}
-    self._recompute(W)
-
-  def _propagate_attr(self, attr_name, join, less):
-    """Performs backward propagation of attribute from goals for which it's defined."""
-
-    wl = set()
-    inferred_attrs = {}
-    def init_wl(g):
-      if getattr(g, attr_name) is not None:
-        inferred_attrs[g.name] = getattr(g, attr_name)
-        for act in g.preds:
-          if act.head:
-            wl.add(act.head)
-    self.visit_goals(callback=init_wl)
-
-    while wl:
-      g = wl.pop()
-
-      succ_attrs = []
-      if g.name in inferred_attrs:
-        succ_attrs.append(inferred_attrs[g.name])
-      for act in g.succs:
-        if act.tail and act.tail.name in inferred_attrs:
-          succ_attrs.append(inferred_attrs[act.tail.name])
-
-      new_attr = join(succ_attrs)
-      if g.name not in inferred_attrs or new_attr != inferred_attrs[g.name]:
-        inferred_attrs[g.name] = new_attr
-        for act in g.preds:
-          if act.head:
-            wl.add(act.head)
-
-    def assign_inferred_attrs(g):
-      new_attr = inferred_attrs.get(g.name)
-      if new_attr is not None:
-        old_attr = getattr(g, attr_name)
-        if old_attr is None:
-          setattr(g, attr_name, new_attr)
-        elif less(old_attr, new_attr):
-          warn(g.loc,
-               f"inferred ({new_attr}) and assigned ({old_attr}) {attr_name} "
-               f"for goal '{g.name}' do not match")
-          setattr(g, attr_name, new_attr)
-    self.visit_goals(callback=assign_inferred_attrs)
-
-  def _recompute(self, W):
-    """Computes aux data structures used for network analysis
-       and propagates attributes."""
-
-    # Index goals by name
-
-    self.name_to_goal = {}
-    def update_name_to_goal(g):
-      self.name_to_goal[g.name] = g
-      if g.id is not None:
-        other_goal = self.name_to_goal.get(g.id, None)
-        error_if(other_goal is not None and other_goal.name != g.name,
-                 f"goals '{other_goal.name}' and '{g.name}' use the same id '{g.id}'")
-        self.name_to_goal[g.id] = g
-    self.visit_goals(callback=update_name_to_goal)
-
-    # Infer completion dates for completed goals
-
-    def compute_completion_date(g):
-      if g.is_completed() and g.completion_date is None \
-          and g.preds and all(act.duration is not None for act in g.preds):
-        g.completion_date = max(act.duration.finish for act in g.preds)
-    self.visit_goals(callback=compute_completion_date)
-
-    # Assign parents for goals which are not explicitly nested
-
-    for g in self.name_to_goal.values():
-      if g.parent is None and g not in self.roots:
-        if g.succs:
-          # First successor becomes parent
-          g.succs[0].tail.add_child(g)
-        else:
-          self.roots.append(g)
-
-    # Compute depths
-
-    depth = [0]
-    def enter(g):
-      g.depth = depth[0]
-      depth[0] += 1
-    def exit(g):
-      depth[0] -= 1
-    self.visit_goals(before=enter, after=exit, hierarchical=True)
-
-    # Propagate assigned priorities and iterations
-
-    self._propagate_attr('prio', max, operator.lt)
-    self._propagate_attr('iter', min, operator.ge)
-
-    # Index iterations
-
-    self.iter_to_goals = {}
-    def update_iter_to_goals(g):
-      self.iter_to_goals.setdefault(g.iter, []).append(g)
-    self.visit_goals(callback=update_iter_to_goals)
-
-  def visit_goals(self, **args):
-    """Visitor pattern for network's goals."""
-    visited = set()
-    for g in self.roots:
-      g.visit(visited, **args)
-
-  def dump(self, p):
-    p.writeln(f"= Network at {self.loc} =\n")
-
-    num_actions = [0]
-    def update_num_actions(g):
-      num_actions[0] += len(g.preds)
-    self.visit_goals(callback=update_num_actions)
-    # TODO: more stats
-    p.writeln(f"Network contains {len(self.name_to_goal)} goals ({len(self.roots)} roots) and "
-              f"{num_actions[0]} actions\n")
-
-    for g in self.roots:
-      g.dump(p)
-      p.writeln('')
-
-  def check(self, W):
-    """Verify invariants."""
-
-    if W == 0:
-      return
-
-    # Some checks already performed before: iteration assignments do not violate deps, prios match
-
-    self.visit_goals(callback=lambda g: g.check(W))
-
-    # Check that iterations are continuous and start from 0
-
-    iters = set()
-    def collect_iters(g):
-      if g.iter is not None:
-        iters.add(g.iter)
-    self.visit_goals(callback=collect_iters)
-    iters = sorted(list(iters))
-    if W and iters:
-      warn_if(iters[0] != 1, "iterations do not start with 1")
-      for itr, nxt in zip(iters, iters[1:]):
-        if itr + 1 != nxt:
-          warn(f"iterations are not consecutive: {itr} and {nxt}")
+def _neighbours(g, hierarchical, preds, succs):
+  """Goals which are visited after G during traversal."""
+  if hierarchical:
+    yield from g.children
+    return
+  if preds:
+    for act in g.preds:
+      if act.head:
+        yield act.head
+  if succs:
+    for act in g.succs:
+      if act.tail:
+        yield act.tail
+
+def walk_goals(roots, visited, *, hierarchical=False, preds=True, succs=True,
+               pre=True, post=False):
+  """Iterative depth-first traversal of goal network.
+
+     Yields (goal, False) when goal is entered (if PRE is set)
+     and (goal, True) when it's left (if POST is set).
+     Goals are visited in the same order as in recursive traversal.
+
+     VISITED is either a bytearray, indexed by Goal.index,
+     or a set of names of goals which should be skipped.
+     It's updated during traversal."""
+
+  if isinstance(visited, bytearray):
+    def first_visit(g):
+      i = g.index
+      if visited[i]:
+        return False
+      visited[i] = 1
+      return True
+  else:
+    def first_visit(g):
+      if g.name in visited:
+        return False
+      visited.add(g.name)
+      return True
+
+  for root in roots:
+    if not first_visit(root):
+      continue
+    if pre:
+      yield root, False
+    stack = [(root, _neighbours(root, hierarchical, preds, succs))]
+    while stack:
+      g, it = stack[-1]
+      for next_g in it:
+        if first_visit(next_g):
+          if pre:
+            yield next_g, False
+          stack.append((next_g, _neighbours(next_g, hierarchical, preds, succs)))
           break
+      else:
+        stack.pop()
+        if post:
+          yield g, True
+
+def index_goals(roots):
+  """Assign dense indices to all goals reachable from ROOTS
+     (via dependencies or hierarchically). Returns list of goals
+     ordered by index."""
+  goals = []
+  visited = set()
+  # Children which are only reachable via hierarchy (e.g. nested
+  # under global activities) are indexed after dependencies
+  start = roots
+  num_scanned = 0
+  while start:
+    for g, _ in walk_goals(start, visited):
+      g.index = len(goals)
+      goals.append(g)
+    start = []
+    while not start and num_scanned < len(goals):
+      start = [c for c in goals[num_scanned].children if c.name not in visited]
+      num_scanned += 1
+  return goals
+
+def _walk_args(args):
+  """Convert arguments of visitors to arguments of walk_goals."""
+  return {
+    'hierarchical': args.get('hierarchical', False),
+    'preds': args.get('preds', True),
+    'succs': args.get('succs', True),
+    'pre': args.get('before', args.get('callback')) is not None,
+    'post': args.get('after') is not None,
+  }
+
+def visit_goals(roots, visited, **args):
+  """Visitor pattern of goal network: calls 'before' (or 'callback')
+     and 'after' callbacks for goals reachable from ROOTS
+     (see walk_goals for VISITED)."""
+  before = args.get('before', args.get('callback', None))
+  after = args.get('after', None)
+  for g, leaving in walk_goals(roots, visited, **_walk_args(args)):
+    if leaving:
+      after(g)
+    else:
+      before(g)
+
+def pred_goals(g):
+  """Goals on which G depends (directly)."""
+  for act in g.preds:
+    if act.head:
+      yield act.head
+  for act in g.global_preds:
+    if act.head:
+      yield act.head
+
+def succ_goals(g):
+  """Goals which depend on G (directly)."""
+  for act in g.succs:
+    if act.tail:
+      yield act.tail
+
+def _update_hash(g):
+  """Compute content hash of goal. Hashes of children
+     must already be computed."""
+  h = _new_hash()
+  # Names of dummy goals are not stable
+  _hash_values(h, '' if g.dummy else g.name, g.dummy, g.id,
+               None if g.prio is None else int(g.prio),
+               None if g.risk is None else int(g.risk),
+               g.iter, g.deadline, g.completion_date)
+  _hash_tracker(h, g)
+  _hash_values(h, len(g.checks))
+  for c in g.checks:
+    _hash_values(h, c.name, c.status)
+    _hash_tracker(h, c)
+  for acts in (g.preds, g.global_preds):
+    _hash_values(h, len(acts))
+    for act in acts:
+      act.update_hash(h)
+  _hash_values(h, len(g.children))
+  for c in g.children:
+    _hash_values(h, c.content_hash)
+  g.content_hash = h.hexdigest()
+
+def hash_goals(roots, num_goals, cached=False):
+  """Compute content hashes of goals (Goal.content_hash) which are
+     hierarchically reachable from ROOTS (NUM_GOALS is number of indexed goals).
+     Hash of goal covers its attributes, checks, preceding activities
+     and (recursively) its children so hashes of unchanged parts
+     of plan remain the same across plan versions. If CACHED is set,
+     hashes are assumed to be already computed.
+     Returns combined hash of ROOTS."""
+  if not cached:
+    for g, _ in walk_goals(roots, bytearray(num_goals),
+                           hierarchical=True, pre=False, post=True):
+      _update_hash(g)
+  h = _new_hash()
+  for g in roots:
+    _hash_values(h, g.content_hash)
+  return h.hexdigest()
+
+class GoalTable:
+  """Flat representation of goals and activities in which references
+     between them are replaced by numbers. Pickling goals directly
+     recurses along dependencies and overflows the stack on large plans
+     so objects which own goals (e.g. Net) pickle a GoalTable instead."""
+
+  _GOAL_ATTRS = _Tracked.__slots__ + Goal.__slots__
+  _ACT_ATTRS = _Tracked.__slots__ + Activity.__slots__
+
+  # Memoized values which are recomputed on demand
+  _GOAL_MEMOS = frozenset(['_act_index', '_complete', '_priority', '_pretty_name'])
+  _GOAL_ACT_LISTS = frozenset(['preds', 'global_preds', 'succs', 'global_succs'])
 
-    # Check for loops
+  def __init__(self):
+    self._goal_ids = {}
+    self._act_ids = {}
+    self._goals = []
+    self._acts = []
+
+  def goal_id(self, g):
+    """Returns number of goal G in table (adding it if necessary)."""
+    if g is None:
+      return None
+    i = self._goal_ids.get(g)
+    if i is None:
+      i = self._goal_ids[g] = len(self._goals)
+      self._goals.append(g)
+    return i
+
+  def _act_id(self, act):
+    i = self._act_ids.get(act)
+    if i is None:
+      i = self._act_ids[act] = len(self._acts)
+      self._acts.append(act)
+    return i
+
+  def _goal_row(self, g):
+    row = []
+    for attr in GoalTable._GOAL_ATTRS:
+      val = getattr(g, attr)
+      if attr in GoalTable._GOAL_ACT_LISTS:
+        val = [self._act_id(act) for act in val]
+      elif attr == 'parent':
+        val = self.goal_id(val)
+      elif attr == 'children':
+        val = [self.goal_id(c) for c in val]
+      elif attr in GoalTable._GOAL_MEMOS:
+        val = None
+      row.append(val)
+    return row
+
+  def _act_row(self, act):
+    row = []
+    for attr in GoalTable._ACT_ATTRS:
+      val = getattr(act, attr)
+      if attr in ('head', 'tail'):
+        val = self.goal_id(val)
+      row.append(val)
+    return row
+
+  def dump(self):
+    """Returns rows of all added goals and goals and activities
+       reachable from them."""
+    goal_rows = []
+    act_rows = []
+    while len(goal_rows) < len(self._goals) or len(act_rows) < len(self._acts):
+      while len(goal_rows) < len(self._goals):
+        goal_rows.append(self._goal_row(self._goals[len(goal_rows)]))
+      while len(act_rows) < len(self._acts):
+        act_rows.append(self._act_row(self._acts[len(act_rows)]))
+    return goal_rows, act_rows
 
-    for root in self.roots:
-      path = []
-      def enter(g, path=path):  # pylint: disable=dangerous-default-value
-        error_if(g.name in path, "found a cycle: %s" % '\n  '.join(path))
-        path.append(g.name)
-      def exit(g, path=path):  # pylint: disable=dangerous-default-value
-        path[:] = path[:-1]
-      root.visit(before=lambda g: enter(g, path), after=lambda g: exit(g, path)) # pylint: disable=cell-var-from-loop,consider-using-sys-exit
+  @staticmethod
+  def load(rows):
+    """Restores goals from rows returned by dump(). Returns list
+       of goals indexed by their numbers."""
+    goal_rows, act_rows = rows
+    goals = [Goal.__new__(Goal) for _ in goal_rows]
+    acts = [Activity.__new__(Activity) for _ in act_rows]
+    for act, row in zip(acts, act_rows):
+      for attr, val in zip(GoalTable._ACT_ATTRS, row):
+        if attr in ('head', 'tail') and val is not None:
+          val = goals[val]
+        setattr(act, attr, val)
+    for g, row in zip(goals, goal_rows):
+      for attr, val in zip(GoalTable._GOAL_ATTRS, row):
+        if attr in GoalTable._GOAL_ACT_LISTS:
+          val = [acts[i] for i in val]
+        elif attr == 'parent' and val is not None:
+          val = goals[val]
+        elif attr == 'children':
+          val = [goals[i] for i in val]
+        setattr(g, attr, val)
+    return goals
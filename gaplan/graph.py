@@ -0,0 +1,252 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2022 Yury Gribov
+#
+# Use of this source code is governed by The MIT License (MIT)
+# that can be found in the LICENSE.txt file.
+
+"""Array-based (compressed sparse row) snapshot of network for analyses.
+
+Goals are identified by their Goal.index and activities by their
+position in NetArrays.activities. Columns are NumPy arrays if NumPy
+is available and standard array.array's otherwise; in both cases
+missing values are encoded as -1 (integer columns) or NaN (float columns).
+
+This module also hosts graph algorithms which are used by Net
+(it does not depend on gaplan.goal so that the latter can import it).
+"""
+
+import array
+
+try:
+  import numpy as np
+except ImportError:
+  np = None
+
+NAN = float('nan')
+
+def strongly_connected(goals, edges):
+  """Find strongly connected components of graph formed by GOALS
+     (which have to be indexed) and EDGES (function which returns
+     neighbours of goal).
+
+     Components are returned in reverse topological order
+     (i.e. each one goes after all components reachable from it).
+     Uses (iterative) Tarjan's algorithm so runs in linear time."""
+
+  n = len(goals)
+  order = [-1] * n  # Order of discovery
+  low = [0] * n
+  on_stack = bytearray(n)
+  stack = []
+  counter = 0
+
+  for root in goals:
+    if order[root.index] >= 0:
+      continue
+
+    order[root.index] = low[root.index] = counter
+    counter += 1
+    stack.append(root)
+    on_stack[root.index] = 1
+    work = [(root, edges(root))]
+
+    while work:
+      g, it = work[-1]
+      i = g.index
+      for h in it:
+        j = h.index
+        if order[j] < 0:
+          order[j] = low[j] = counter
+          counter += 1
+          stack.append(h)
+          on_stack[j] = 1
+          work.append((h, edges(h)))
+          break
+        if on_stack[j]:
+          low[i] = min(low[i], order[j])
+      else:
+        work.pop()
+        if work:
+          parent = work[-1][0].index
+          low[parent] = min(low[parent], low[i])
+        if low[i] == order[i]:
+          scc = []
+          while True:
+            h = stack.pop()
+            on_stack[h.index] = 0
+            scc.append(h)
+            if h is g:
+              break
+          yield scc
+
+def _column(typecode, values):
+  """Create read-only column of given type ('i' or 'd')."""
+  if np is None:
+    return array.array(typecode, values)
+  col = np.array(list(values), dtype=np.int32 if typecode == 'i' else np.float64)
+  col.flags.writeable = False
+  return col
+
+def _float(v):
+  return NAN if v is None else float(v)
+
+class CSR:
+  """Adjacency lists in compressed sparse row format:
+     neighbours of node I are TARGETS[OFFSETS[I]:OFFSETS[I + 1]]."""
+
+  __slots__ = ('offsets', 'targets')
+
+  def __init__(self, lists):
+    offsets = [0]
+    targets = []
+    for lst in lists:
+      targets.extend(lst)
+      offsets.append(len(targets))
+    self.offsets = _column('i', offsets)
+    self.targets = _column('i', targets)
+
+  def __len__(self):
+    return len(self.offsets) - 1
+
+  def neighbours(self, i):
+    return self.targets[self.offsets[i]:self.offsets[i + 1]]
+
+  def degree(self, i):
+    return self.offsets[i + 1] - self.offsets[i]
+
+  def num_edges(self):
+    return len(self.targets)
+
+class NetArrays:
+  """Immutable snapshot of network in array form (see Net.arrays())."""
+
+  def __init__(self, net):
+    goals = self.goals = list(net.goals)
+
+    # Activities are numbered in order of goal's preds and global_preds
+    # (activities without target goal are included as well)
+    self.activities = []
+    act_index = {}
+    for g in goals:
+      for act in g.preds + g.global_preds:
+        if act not in act_index:
+          act_index[act] = len(self.activities)
+          self.activities.append(act)
+
+    # Goals outside of network (e.g. ends of global activities)
+    # are skipped in adjacency lists and encoded as -1 in columns
+    def index(g):
+      return g.index if g is not None and net.contains(g) else -1
+
+    def ids(goal_lists):
+      return CSR([[h.index for h in lst if h is not None and net.contains(h)]
+                  for lst in goal_lists])
+
+    # Dependencies between goals
+    self.preds = ids([act.head for act in g.preds] for g in goals)
+    self.succs = ids([act.tail for act in g.succs] for g in goals)
+    self.global_preds = ids([act.head for act in g.global_preds] for g in goals)
+    self.global_succs = ids([act.tail for act in g.global_succs] for g in goals)
+    self.children = ids(g.children for g in goals)
+    # Preceding activities of goals (both normal and global)
+    self.pred_acts = CSR([act_index[act] for act in g.preds + g.global_preds]
+                         for g in goals)
+
+    # Goal columns
+    self.parent = _column('i', (index(g.parent) for g in goals))
+    self.depth = _column('i', (g.depth for g in goals))
+    self.completion = _column('i', (g.complete() for g in goals))
+    self.iter = _column('i', (-1 if g.iter is None else g.iter for g in goals))
+    self.prio = _column('i', (-1 if g.prio is None else int(g.prio) for g in goals))
+    self.risk = _column('i', (-1 if g.risk is None else int(g.risk) for g in goals))
+    self.priority = _column('d', (_float(g.priority()) for g in goals))
+
+    # Activity columns (efforts are in hours)
+    acts = self.activities
+    self.act_head = _column('i', (index(act.head) for act in acts))
+    self.act_tail = _column('i', (index(act.tail) for act in acts))
+    self.effort_min = _column('d', (_float(act.effort.min) for act in acts))
+    self.effort_max = _column('d', (_float(act.effort.max) for act in acts))
+    self.effort_real = _column('d', (_float(act.effort.real) for act in acts))
+    # Fraction of completed work
+    self.act_completion = _column('d', (act.effort.completion for act in acts))
+
+  def __len__(self):
+    return len(self.goals)
+
+class Hierarchy:
+  """Index for fast ancestor queries (see Net.is_ancestor).
+
+     Hierarchy is numbered via Euler tour so each goal's subtree
+     corresponds to an interval of numbers."""
+
+  def __init__(self, net):
+    n = len(net.goals)
+    self.enter = [-1] * n
+    self.exit = [-1] * n
+    time = 0
+    stack = [(g, False) for g in reversed(net.roots)]
+    while stack:
+      g, leaving = stack.pop()
+      if leaving:
+        self.exit[g.index] = time
+      else:
+        self.enter[g.index] = time
+        stack.append((g, True))
+        stack.extend((c, False) for c in reversed(g.children))
+      time += 1
+
+  def is_ancestor(self, a, b):
+    """Is goal A a (proper) hierarchical ancestor of goal B?"""
+    i, j = a.index, b.index
+    return i != j and 0 <= self.enter[i] < self.enter[j] \
+      and self.exit[j] < self.exit[i]
+
+class Closure:
+  """Transitive closure of dependencies (see Net.depends_on).
+
+     Strongly connected components of dependency graph are numbered
+     in reverse topological order (each component gets larger number
+     than components it depends on) and set of components reachable
+     from each component is stored as a bitset (Python integer)."""
+
+  def __init__(self, net):
+    # Goals which are only reachable via global dependencies
+    # are not part of network and are skipped by Net.pred_goals
+    pred_goals = net.pred_goals
+    self.component = [0] * len(net.goals)
+    self.cyclic = []
+    self.reach = []
+    for num, scc in enumerate(strongly_connected(net.goals, pred_goals)):
+      bits = 1 << num
+      for g in scc:
+        self.component[g.index] = num
+        for h in pred_goals(g):
+          c = self.component[h.index]
+          if c != num:
+            bits |= self.reach[c]
+      self.cyclic.append(len(scc) > 1 or any(h is scc[0] for h in pred_goals(scc[0])))
+      self.reach.append(bits)
+
+  def __len__(self):
+    return len(self.reach)
+
+  def depends_on(self, a, b):
+    """Does goal A (transitively) depend on goal B?"""
+    c, d = self.component[a.index], self.component[b.index]
+    if c == d:
+      return self.cyclic[c]
+    return (self.reach[c] >> d) & 1 == 1
+
+  def runs(self, c):
+    """Maximal intervals of numbers of components reachable from component C
+       (including C itself)."""
+    bits = format(self.reach[c], 'b')[::-1]
+    start = bits.find('1')
+    while start >= 0:
+      end = bits.find('0', start)
+      if end < 0:
+        end = len(bits)
+      yield start, end - 1
+      start = bits.find('1', end)
@@ -0,0 +1,72 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2022 Yury Gribov
+#
+# Use of this source code is governed by The MIT License (MIT)
+# that can be found in the LICENSE.txt file.
+
+"""Secondary indexes of goals (by priority, assignee, deadline, etc.).
+
+Goals are identified by their Goal.index. Lists of goals
+in dictionaries are sorted by it.
+"""
+
+class GoalIndex:
+  """Secondary indexes of goals in network (see Net.index())."""
+
+  def __init__(self, net):
+    self.goals = net.goals
+    self.by_prio = {}
+    self.by_risk = {}
+    self.by_iter = {}
+    # Assignees of preceding activities (resources or teams)
+    self.by_alloc = {}
+    # Tracker links of goal and its preceding activities
+    self.by_task = {}
+    self.by_pr = {}
+    # Goals with pending checks and completed goals
+    self.pending = []
+    self.completed = []
+
+    deadlines = []
+
+    for g in self.goals:
+      i = g.index
+
+      for attr, idx in ((g.prio, self.by_prio),
+                        (g.risk, self.by_risk),
+                        (g.iter, self.by_iter)):
+        if attr is not None:
+          idx.setdefault(int(attr), []).append(i)
+
+      names = set()
+      tasks = set()
+      prs = set()
+      if g.has_tracker():
+        tasks |= g.tracker.tasks
+        prs |= g.tracker.prs
+      for act in g.preds:
+        names.update(act.alloc)
+        names.update(act.real_alloc)
+        if act.has_tracker():
+          tasks |= act.tracker.tasks
+          prs |= act.tracker.prs
+      names.discard('all')
+      for keys, idx in ((names, self.by_alloc),
+                        (tasks, self.by_task),
+                        (prs, self.by_pr)):
+        for key in keys:
+          idx.setdefault(key, []).append(i)
+
+      if any(not c.done() for c in g.checks):
+        self.pending.append(i)
+      if g.is_completed():
+        self.completed.append(i)
+
+      if g.deadline is not None:
+        deadlines.append((g.deadline, i))
+
+    # Goals with deadlines (sorted by deadline)
+    deadlines.sort()
+    self.deadlines = [d for d, _ in deadlines]
+    self.deadline_goals = [i for _, i in deadlines]
@@ -0,0 +1,405 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2022 Yury Gribov
+#
+# Use of this source code is governed by The MIT License (MIT)
+# that can be found in the LICENSE.txt file.
+
+"""Network of goals i.e. a single declarative plan."""
+
+import copy
+import time
+import operator
+import logging
+
+from gaplan.common.error import error, warn, error_if, warn_if, record_warnings
+import gaplan.goal as G
+import gaplan.graph as GR
+import gaplan.rollup as R
+
+logger = logging.getLogger(__name__)
+
+class Net:
+  """Class which represents a single declarative plan (goals, iterations, etc.)."""
+
+  def __init__(self, roots, W, loc):
+    self.roots = roots
+    self.loc = loc
+    self.name_to_goal = {}
+    self.iter_to_goals = {}
+    # All goals (ordered by Goal.index)
+    self.goals = []
+    # Durations of stages of last _recompute (in seconds)
+    self.timings = {}
+    # Array snapshot (see arrays())
+    self._arrays = None
+    # Indexes for is_ancestor and depends_on (computed on demand)
+    self._hierarchy = self._closure = None
+    # Secondary indexes (see index())
+    self._index = None
+    # Results of other analyses (e.g. gaplan.rollup) which are cached
+    # until network is recomputed
+    self.analyses = {}
+    # Have content hashes been computed (see compute_hashes())?
+    self._hashed = False
+    self._recompute(W)
+
+  def __getstate__(self):
+    # Goals are stored in flat table to avoid deep recursion in pickle;
+    # derived indexes are dropped and recomputed on demand
+    table = G.GoalTable()
+    state = self.__dict__.copy()
+    state['roots'] = [table.goal_id(g) for g in self.roots]
+    state['goals'] = [table.goal_id(g) for g in self.goals]
+    state['name_to_goal'] = {name: table.goal_id(g)
+                             for name, g in self.name_to_goal.items()}
+    state['iter_to_goals'] = {i: [table.goal_id(g) for g in goals]
+                              for i, goals in self.iter_to_goals.items()}
+    state['_arrays'] = state['_hierarchy'] = state['_closure'] = state['_index'] = None
+    state['analyses'] = {}
+    state['_goal_table'] = table.dump()
+    return state
+
+  def __setstate__(self, state):
+    goals = G.GoalTable.load(state.pop('_goal_table'))
+    self.__dict__.update(state)
+    self.roots = [goals[i] for i in self.roots]
+    self.goals = [goals[i] for i in self.goals]
+    self.name_to_goal = {name: goals[i] for name, i in self.name_to_goal.items()}
+    self.iter_to_goals = {i: [goals[j] for j in lst]
+                          for i, lst in self.iter_to_goals.items()}
+
+  def _infer_attrs(self, attrs):
+    """Performs backward propagation of attributes from goals for which they are defined.
+       ATTRS is a list of (name, join) pairs. Returns lists of inferred
+       values of attributes (indexed by Goal.index).
+
+       All attributes are propagated in a single pass over strongly connected
+       components of network (successors are processed before predecessors)."""
+
+    n = len(self.goals)
+    inferred_attrs = [[None] * n for _ in attrs]
+
+    for scc in GR.strongly_connected(self.goals, G.succ_goals):
+      for (attr_name, join), inferred in zip(attrs, inferred_attrs):
+        vals = []
+        for g in scc:
+          val = getattr(g, attr_name)
+          if val is not None:
+            vals.append(val)
+          for act in g.succs:
+            if act.tail is not None:
+              val = inferred[act.tail.index]
+              if val is not None:
+                vals.append(val)
+        if vals:
+          new_attr = join(vals)
+          for g in scc:
+            inferred[g.index] = new_attr
+
+    return inferred_attrs
+
+  def _recompute(self, W):
+    """Computes aux data structures used for network analysis
+       and propagates attributes.
+
+       Works in several stages, each of which does a single pass
+       over network. Durations of stages are stored in self.timings."""
+
+    self.timings = {}
+    self._arrays = self._hierarchy = self._closure = self._index = None
+    self.analyses = {}
+    self._hashed = False
+    start = [time.perf_counter()]
+    def finish_stage(stage):
+      now = time.perf_counter()
+      self.timings[stage] = now - start[0]
+      start[0] = now
+
+    # Collect goals (Net.goals is ordered as preorder iter_goals(),
+    # followed by goals which are only reachable hierarchically)
+
+    self.goals = G.index_goals(self.roots)
+    finish_stage('index')
+
+    # Index goals by name, infer completion dates for completed goals
+    # and assign parents for goals which are not explicitly nested
+
+    self.name_to_goal = {}
+    roots = set(self.roots)
+    for g in self.goals:
+      self.name_to_goal[g.name] = g
+      if g.id is not None:
+        other_goal = self.name_to_goal.get(g.id, None)
+        error_if(other_goal is not None and other_goal.name != g.name,
+                 f"goals '{other_goal.name}' and '{g.name}' use the same id '{g.id}'")
+        self.name_to_goal[g.id] = g
+
+      if g.is_completed() and g.completion_date is None \
+          and g.preds and all(act.duration is not None for act in g.preds):
+        g.completion_date = max(act.duration.finish for act in g.preds)
+
+      if g.parent is None and g not in roots:
+        if g.succs:
+          # First successor becomes parent
+          g.succs[0].tail.add_child(g)
+        else:
+          self.roots.append(g)
+          roots.add(g)
+    finish_stage('names')
+
+    # Compute depths
+
+    depth = 0
+    for g, leaving in G.walk_goals(self.roots, bytearray(len(self.goals)),
+                                   hierarchical=True, post=True):
+      if leaving:
+        depth -= 1
+      else:
+        g.depth = depth
+        depth += 1
+    finish_stage('depths')
+
+    # Propagate assigned priorities and iterations
+
+    attrs = [('prio', max, operator.lt),
+             ('iter', min, operator.ge)]
+    inferred_attrs = self._infer_attrs([(attr_name, join) for attr_name, join, _ in attrs])
+    finish_stage('propagate')
+
+    # Update attributes and index iterations
+
+    self.iter_to_goals = {}
+    for g in self.goals:
+      for (attr_name, _, less), inferred in zip(attrs, inferred_attrs):
+        new_attr = inferred[g.index]
+        if new_attr is not None:
+          old_attr = getattr(g, attr_name)
+          if old_attr is None:
+            setattr(g, attr_name, new_attr)
+          elif less(old_attr, new_attr):
+            warn(g.loc,
+                 f"inferred ({new_attr}) and assigned ({old_attr}) {attr_name} "
+                 f"for goal '{g.name}' do not match")
+            setattr(g, attr_name, new_attr)
+      self.iter_to_goals.setdefault(g.iter, []).append(g)
+    finish_stage('update')
+
+    logger.debug("Net._recompute: %s",
+                 ', '.join(f"{stage} {t:.3f}s" for stage, t in self.timings.items()))
+
+  def compute_hashes(self):
+    """Compute content hashes of all goals (Goal.content_hash).
+       Hash of goal covers its attributes, checks, preceding activities
+       and (recursively) its children so hashes of unchanged parts
+       of plan remain the same across plan versions.
+       Returns combined hash of whole network."""
+    h = G.hash_goals(self.roots, len(self.goals), cached=self._hashed)
+    self._hashed = True
+    return h
+
+  def index(self):
+    """Returns secondary indexes of goals (see gaplan.index).
+       Indexes are computed on first call and reused until network
+       is recomputed."""
+    if self._index is None:
+      from gaplan import index  # pylint: disable=import-outside-toplevel
+      self._index = index.GoalIndex(self)
+    return self._index
+
+  def contains(self, g):
+    """Is goal part of network? Goals which are only reachable
+       via global dependencies are not."""
+    i = g.index
+    return i is not None and i < len(self.goals) and self.goals[i] is g
+
+  def pred_goals(self, g):
+    """Goals of network on which G depends (directly)."""
+    for h in G.pred_goals(g):
+      if self.contains(h):
+        yield h
+
+  def slice(self, goal, depth=None):
+    """Returns goals which are needed to complete GOAL: the goal itself,
+       its hierarchical ancestors and goals it (transitively) depends on
+       (global dependencies of ancestors included). DEPTH limits
+       number of dependency levels. Goals are ordered by Goal.index."""
+
+    def deps(g):
+      yield from G.pred_goals(g)
+      p = g.parent
+      while p is not None:
+        for act in p.global_preds:
+          if act.head:
+            yield act.head
+        p = p.parent
+
+    selected = bytearray(len(self.goals))
+    for g in goal.parents():
+      selected[g.index] = 1
+    selected[goal.index] = 1
+
+    level = [goal]
+    d = 0
+    while level and (depth is None or d < depth):
+      next_level = []
+      for g in level:
+        for h in deps(g):
+          if not self.contains(h):
+            continue
+          if not selected[h.index]:
+            selected[h.index] = 1
+            next_level.append(h)
+      level = next_level
+      d += 1
+
+    return [g for g in self.goals if selected[g.index]]
+
+  def subnet(self, goals):
+    """Returns network which consists of copies of GOALS
+       and activities between them (other activities are dropped)."""
+
+    copies = {}
+    for g in goals:
+      new_g = copies[g] = copy.copy(g)
+    act_copies = {}
+
+    def copy_acts(acts):
+      new_acts = []
+      for act in acts:
+        if act.head not in copies or act.tail not in copies:
+          continue
+        new_act = act_copies.get(act)
+        if new_act is None:
+          new_act = act_copies[act] = copy.copy(act)
+          new_act.head = copies[act.head]
+          new_act.tail = copies[act.tail]
+        new_acts.append(new_act)
+      return new_acts
+
+    roots = []
+    for g, new_g in copies.items():
+      new_g.preds = copy_acts(g.preds)
+      new_g.global_preds = copy_acts(g.global_preds)
+      new_g.succs = copy_acts(g.succs)
+      new_g.global_succs = copy_acts(g.global_succs)
+      new_g.children = [copies[c] for c in g.children if c in copies]
+      new_g.parent = copies.get(g.parent)
+      new_g.invalidate()
+      if new_g.parent is None:
+        roots.append(new_g)
+
+    # Attributes have already been propagated (and checked) in this network
+    with record_warnings(quiet=True):
+      return Net(roots, 0, self.loc)
+
+  def arrays(self):
+    """Returns array-based snapshot of network (see gaplan.graph)
+       which is suitable for vectorized analyses.
+       Snapshot is computed on first call and reused until network
+       is recomputed."""
+    if self._arrays is None:
+      self._arrays = GR.NetArrays(self)
+    return self._arrays
+
+  def _hierarchy_index(self):
+    if self._hierarchy is None:
+      self._hierarchy = GR.Hierarchy(self)
+    return self._hierarchy
+
+  def _closure_index(self):
+    if self._closure is None:
+      self._closure = GR.Closure(self)
+    return self._closure
+
+  def is_ancestor(self, a, b):
+    """Is goal A a (proper) hierarchical ancestor of goal B?
+       Runs in constant time (after linear-time precomputation)."""
+    return self._hierarchy_index().is_ancestor(a, b)
+
+  def depends_on(self, a, b):
+    """Does goal A depend (directly or transitively) on goal B?
+       Closure of dependencies is computed on first query."""
+    return self._closure_index().depends_on(a, b)
+
+  def iter_goals(self, order='pre', roots=None, hierarchical=False, preds=True, succs=True):
+    """Iterate over goals reachable from ROOTS (or from network roots)
+       in preorder ('pre') or postorder ('post').
+       Supports both hierarchical and dependency-based traversals."""
+    error_if(order not in ('pre', 'post'), f"unknown traversal order '{order}'")
+    post = order == 'post'
+    walk = G.walk_goals(self.roots if roots is None else roots,
+                        bytearray(len(self.goals)),
+                        hierarchical=hierarchical, preds=preds, succs=succs,
+                        pre=not post, post=post)
+    for g, _ in walk:
+      yield g
+
+  def visit_goals(self, roots=None, **args):
+    """Visitor pattern for network's goals."""
+    G.visit_goals(self.roots if roots is None else roots,
+                  bytearray(len(self.goals)), **args)
+
+  def dump(self, p):
+    p.writeln(f"= Network at {self.loc} =\n")
+
+    num_actions = sum(len(g.preds) for g in self.iter_goals())
+    # TODO: more stats
+    p.writeln(f"Network contains {len(self.name_to_goal)} goals ({len(self.roots)} roots) and "
+              f"{num_actions} actions")
+    rollup = R.of(self)
+    p.writeln(f"Total work: {rollup.total()}\n")
+
+    for g in self.roots:
+      g.dump(p, rollup)
+      p.writeln('')
+
+  def check(self, W):
+    """Verify invariants."""
+
+    if W == 0:
+      return
+
+    # Some checks already performed before: iteration assignments do not violate deps, prios match
+
+    for g in self.iter_goals():
+      g.check(W)
+
+    # Check that iterations are continuous and start from 0
+
+    iters = set()
+    for g in self.iter_goals():
+      if g.iter is not None:
+        iters.add(g.iter)
+    iters = sorted(list(iters))
+    if W and iters:
+      warn_if(iters[0] != 1, "iterations do not start with 1")
+      for itr, nxt in zip(iters, iters[1:]):
+        if itr + 1 != nxt:
+          warn(f"iterations are not consecutive: {itr} and {nxt}")
+          break
+
+    # Check for loops
+
+    cycles = self.find_cycles()
+    if cycles:
+      lines = []
+      for i, cycle in enumerate(cycles):
+        lines.append(f"cycle {i + 1}:")
+        lines.extend(f"  {g.loc}: {g.name}" for g in cycle)
+      error(f"found {len(cycles)} cycle(s) in plan:\n  " + '\n  '.join(lines))
+
+  def find_cycles(self):
+    """Find all cycles in dependency graph.
+
+       Returns strongly connected components which contain cycles
+       (each one is a list of goals, ordered by Goal.index)."""
+
+    cycles = []
+    for scc in GR.strongly_connected(self.goals, self.pred_goals):
+      if len(scc) > 1 or any(h is scc[0] for h in self.pred_goals(scc[0])):
+        scc.sort(key=lambda g: g.index)
+        cycles.append(scc)
+
+    cycles.sort(key=lambda scc: scc[0].index)
+    return cycles
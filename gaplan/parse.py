@@ -8,13 +8,17 @@
 """APIs for parsing declarative plans."""
 
 import re
+import os.path
 import logging
+from concurrent.futures import ProcessPoolExecutor
 
-from gaplan.common.error import error, error_if
+from gaplan.common.error import error, error_if, record_warnings, replay_warnings
 import gaplan.common.parse as PA
 import gaplan.common.matcher as M
 import gaplan.goal as G
+import gaplan.net as N
 from gaplan.common.location import Location
+from gaplan.common import platform
 from gaplan import project
 from gaplan import schedule
 
@@ -31,6 +35,7 @@ class LexemeType:
   PRJ_ATTR   = "PRJ_ATTR"
   ASSIGN     = "="
   SCHED      = 'SCHED'
+  INCLUDE    = 'INCLUDE'
   COMMA      = ','
   EOF        = ''
 
@@ -39,12 +44,40 @@ class LexerMode:
   NORMAL = "NORMAL"
   ATTR   = "ATTR"
 
+# All lexemes which are recognized in normal mode are matched
+# by a single alternation. Alternatives are tried in order
+# so earlier ones take precedence.
+_NORMAL_PATTERN = r"""
+    (?P<ARROW>     (?P<arrow_ws>\ *) \| (?P<arrow_dir>[<>]) - )
+  | (?P<CHECK>     (?P<check_ws>\ *) \|\[ (?P<check_status>[^\]]*) \] \s* (?P<check_text>.*?) (?=//|$) )
+  | (?P<SCHED>     (?P<sched_ws>\s*) (?P<sched_type>--|\|\|) \s* )
+  | (?P<GOAL>      (?P<goal_ws>\ *) \| (?P<goal_name>.*?) (?=//|$) )
+  | (?P<ATTR_START> \s*// )
+  | (?P<INCLUDE>   include \s+ " (?P<include_path>[^"]*) " )
+  | (?P<PRJ_ATTR>  (?P<prj_attr_name>[A-Za-z][A-Za-z0-9_]*) (?=\s*=) )
+  | (?P<ASSIGN>    \s*=\s* )
+"""
+
+class _Patterns:
+  """Patterns used by lexer (for str or bytes input)."""
+
+  def __init__(self, binary):
+    conv = (lambda s: s.encode('utf-8')) if binary else (lambda s: s)
+    self.normal = re.compile(conv(_NORMAL_PATTERN), re.VERBOSE)
+    self.attr_delim = re.compile(conv(r'[,()]'))
+    self.comma = conv(',')
+    self.lparen = conv('(')
+    self.comment = conv('#')
+
+_PATTERNS = {False: _Patterns(False), True: _Patterns(True)}
+
 class Lexer(PA.BaseLexer):
   """Lexer for declarative plans."""
 
   def __init__(self):
     super().__init__()
     self.mode = LexerMode.NORMAL
+    self.pats = _PATTERNS[False]
 
   def reset(self, filename, lines):
     super().reset(filename, lines)
@@ -52,64 +85,84 @@ class Lexer(PA.BaseLexer):
 
   def update_on_newline(self):
     self.mode = LexerMode.NORMAL
+    self.pats = _PATTERNS[self.binary]
+    line = self.line
     # Strip comments
-    self.line = re.sub(r'#.*$', '', self.line)
+    i = line.find(self.pats.comment, self.pos, self.end)
+    if i >= 0:
+      self.end = i
     # And trailing whites
-    self.line = self.line.rstrip()
+    while self.end > self.pos and line[self.end - 1:self.end].isspace():
+      self.end -= 1
+
+  def _next_attr(self):
+    line = self.line
+    pats = self.pats
+    start = self.pos
+    # Skip leading whites
+    while line[start:start + 1].isspace():
+      start += 1
+    if line[start:start + 1] == pats.comma:
+      return ',', start, start + 1
+    # Element ends at first comma which is not enclosed in parens
+    nest = 0
+    for m in pats.attr_delim.finditer(line, start, self.end):
+      c = m.group()
+      if c == pats.comma:
+        if not nest:
+          return LexemeType.LIST_ELT, start, m.start()
+      elif c == pats.lparen:
+        nest += 1
+      else:
+        nest -= 1
+    self.mode = LexerMode.NORMAL
+    return LexemeType.LIST_ELT, start, self.end
 
   def next_internal(self):
-    if self.line == '':
+    if self.at_eol():
       # File exhausted
       type = LexemeType.EOF
       data = text = ''
     elif self.mode == LexerMode.ATTR:
-      nest = 0
-      self.line = self.line.lstrip()
-      if self.line[0] == ',':
-        type = ','
-        i = 1
-      else:
-        type = LexemeType.LIST_ELT
-        for i, c in enumerate(self.line):
-          if c == ',' and not nest:
-            break
-          if c == '(':
-            nest += 1
-          elif c == ')':
-            nest -= 1
-        else:
-          i += 1
-          self.mode = LexerMode.NORMAL
-      text = self.line[:i]
+      type, start, end = self._next_attr()
+      text = self.decode(self.line[start:end])
       data = text.rstrip()
-      self.line = self.line[i:]
+      self.pos = end
     else:
+      m = self.pats.normal.match(self.line, self.pos, self.end)
+      if m is None:
+        error(self._loc(), f"unexpected syntax: {self.rest()}")
+      decode = self.decode
+      kind = m.lastgroup
       data = None
-      if M.match(r'( *)\|([<>])-', self.line):
-        type = LexemeType.LARROW if M.group(2) == '<' else LexemeType.RARROW
-        data = len(M.group(1))
-      elif M.match(r'( *)\|\[([^\]]*)\]\s*(.*?)(?=(//|$))', self.line):
+      if kind == 'ARROW':
+        type = LexemeType.LARROW if decode(m.group('arrow_dir')) == '<' else LexemeType.RARROW
+        data = len(m.group('arrow_ws'))
+      elif kind == 'CHECK':
         type = LexemeType.CHECK
-        data = len(M.group(1)), M.group(2), M.group(3).strip()
-      elif M.match(r'^(\s*)(--|\|\|)\s*', self.line):
+        data = (len(m.group('check_ws')),
+                decode(m.group('check_status')),
+                decode(m.group('check_text')).strip())
+      elif kind == 'SCHED':
         type = LexemeType.SCHED
-        data = len(M.group(1)), M.group(2)
-      elif M.match(r'( *)\|(.*?)(?=//|$)', self.line):
+        data = len(m.group('sched_ws')), decode(m.group('sched_type'))
+      elif kind == 'GOAL':
         type = LexemeType.GOAL
-        data = len(M.group(1)), M.group(2).strip()
-      elif M.match(r'\s*//', self.line):
+        data = len(m.group('goal_ws')), decode(m.group('goal_name')).strip()
+      elif kind == 'ATTR_START':
         type = LexemeType.ATTR_START
         self.mode = LexerMode.ATTR
-      elif M.match(r'([A-Za-z][A-Za-z0-9_]*)(?=\s*=)', self.line):
+      elif kind == 'INCLUDE':
+        type = LexemeType.INCLUDE
+        data = decode(m.group('include_path'))
+      elif kind == 'PRJ_ATTR':
         type = LexemeType.PRJ_ATTR
-        data = M.group(1)
-      elif M.match(r'\s*=\s*', self.line):
+        data = decode(m.group('prj_attr_name'))
+      else:
         type = LexemeType.ASSIGN
         self.mode = LexerMode.ATTR
-      else:
-        error(self._loc(), f"unexpected syntax: {self.line}")
-      self.line = self.line[len(M.group(0)):]
-      text = M.group(0)
+      self.pos = m.end()
+      text = decode(m.group(0))
     self.lexemes.append(PA.Lexeme(type, data, text, self._loc()))
 
 class Parser(PA.BaseParser):
@@ -118,12 +171,17 @@ class Parser(PA.BaseParser):
   def __init__(self):
     super().__init__(Lexer())
     self.dummy_goal_count = self.project_attrs = self.names = None
+    self.filename = self.attr_locs = None
+    self.files = []
 
   def reset(self, filename, lines):
     super().reset(filename, lines)
+    self.filename = filename
     self.dummy_goal_count = 0
     self.project_attrs = {}
     self.names = {}
+    self.attr_locs = {}
+    self.files = []
 
   def parse_attrs(self):
     a = []
@@ -192,28 +250,6 @@ class Parser(PA.BaseParser):
         a = self.parse_attrs()
         check.add_attrs(a, l.loc)
 
-  def parse_subgoals(self, goal, offset):
-    while True:
-      l = self.lex.peek()
-      if l.type not in {LexemeType.LARROW, LexemeType.RARROW}:
-        return
-      logger.debug(f"parse_subgoals: new edge: {l}")
-
-      is_pred = l.type == LexemeType.LARROW
-      edge_offset = l.data
-      if edge_offset != offset:
-        return
-      logger.debug(f"parse_subgoals: new subgoal: {l}")
-
-      act = self.parse_edge()
-      subgoal = self.parse_goal(edge_offset + len('|<-'),
-                                goal, is_pred, allow_empty=True)
-      act.set_endpoints(goal, subgoal, is_pred)
-
-      goal.add_activity(act, is_pred)
-      if subgoal:
-        subgoal.add_activity(act, not is_pred)
-
   def _make_dummy_goal(self, loc):
     name = f'dummy_{self.dummy_goal_count}'
     self.dummy_goal_count += 1
@@ -221,8 +257,10 @@ class Parser(PA.BaseParser):
     self.names[name] = goal
     return goal
 
-  def parse_goal(self, offset, other_goal, is_pred, allow_empty=False):
-    logger.debug(f"parse_goal: start lex: {self.lex.peek()}")
+  def _start_goal(self, offset, other_goal, is_pred, allow_empty):
+    """Parse goal declaration and checks (but not subgoals)."""
+
+    logger.debug(f"_start_goal: start lex: {self.lex.peek()}")
     loc = self.lex.loc()
     goal_name, goal_attrs = self.maybe_parse_goal_decl(offset)
 
@@ -232,34 +270,77 @@ class Parser(PA.BaseParser):
       # The infamous PERT dummy goals
       goal = self._make_dummy_goal(loc)
       was_defined = False
-      logger.debug("parse_goal: creating dummy goal")
+      logger.debug("_start_goal: creating dummy goal")
     else:
       goal = self.names.get(goal_name)
       if goal is None:
         was_defined = False
         goal = self.names[goal_name] = G.Goal(goal_name, loc)
-        logger.debug(f"parse_goal: parsed new goal: {goal.name}")
+        logger.debug(f"_start_goal: parsed new goal: {goal.name}")
       else:
         was_defined = goal.defined
-        logger.debug(f"parse_goal: parsed existing goal: {goal.name}")
+        logger.debug(f"_start_goal: parsed existing goal: {goal.name}")
 
     if goal_attrs:
       error_if(was_defined, loc,
                f"duplicate definition of goal '{goal.name}' "
                f"(previous definition was in {goal.loc})")
       goal.add_attrs(goal_attrs, loc)
+      self.attr_locs[goal.name] = loc
 
     # TODO: Gaperton's examples contain interwined checks and deps
     self.parse_checks(goal, offset)
 
-    self.parse_subgoals(goal, offset)
+    return _GoalFrame(goal, offset, other_goal, is_pred=is_pred,
+                      was_defined=was_defined, has_attrs=bool(goal_attrs))
 
-    if not was_defined and (goal.checks or goal_attrs or goal.children):
+  @staticmethod
+  def _finish_goal(frame):
+    """Update goal after all it's subgoals have been parsed."""
+    goal = frame.goal
+    if not frame.was_defined and (goal.checks or frame.has_attrs or goal.children):
       goal.defined = True
-      if other_goal is not None and is_pred:
-        other_goal.add_child(goal)
+      if frame.other_goal is not None and frame.is_pred:
+        frame.other_goal.add_child(goal)
 
-    return goal
+  def parse_goal(self, offset, other_goal, is_pred, allow_empty=False):
+    """Parse goal together with all it's subgoals.
+
+       Nested subgoals are tracked in explicit stack (rather than
+       via recursion) to support arbitrarily deep plans."""
+
+    frame = self._start_goal(offset, other_goal, is_pred, allow_empty)
+    if frame is None:
+      return None
+
+    stack = [frame]
+    while True:
+      frame = stack[-1]
+
+      l = self.lex.peek()
+      if l.type in (LexemeType.LARROW, LexemeType.RARROW) and l.data == frame.offset:
+        logger.debug(f"parse_goal: new edge: {l}")
+        is_pred = l.type == LexemeType.LARROW
+        act = self.parse_edge()
+        subframe = self._start_goal(frame.offset + len('|<-'),
+                                    frame.goal, is_pred, allow_empty=True)
+        subframe.act = act
+        stack.append(subframe)
+        continue
+
+      # No more subgoals
+      self._finish_goal(frame)
+      stack.pop()
+      if not stack:
+        return frame.goal
+
+      # Connect subgoal to parent
+      goal = stack[-1].goal
+      subgoal = frame.goal
+      act = frame.act
+      act.set_endpoints(goal, subgoal, frame.is_pred)
+      goal.add_activity(act, frame.is_pred)
+      subgoal.add_activity(act, not frame.is_pred)
 
   def parse_project_attr(self):
     l = self.lex.next()
@@ -278,6 +359,7 @@ class Parser(PA.BaseParser):
     def expect_one_value(loc, name, vals):
       error_if(len(vals) != 1, loc, f"too many values for attribute '{name}': " + ', '.join(vals))
 
+    m = M.Matcher()
     if name in {'name', 'tracker_link', 'pr_link'}:
       expect_one_value(l.loc, name, rhs)
       val = rhs[0]
@@ -287,9 +369,9 @@ class Parser(PA.BaseParser):
     elif name == 'members':
       val = []
       for rc_info in rhs:
-        if not M.match(r'([A-Za-z][A-Za-z0-9_]*)\s*(?:\(([^\)]*)\))?', rc_info):
+        if not m.match(r'([A-Za-z][A-Za-z0-9_]*)\s*(?:\(([^\)]*)\))?', rc_info):
           error(attr_loc, f"failed to parse resource declaration: {rc_info}")
-        rc_name, attrs = M.groups()
+        rc_name, attrs = m.groups()
         rc = project.Resource(rc_name, attr_loc)
         if attrs:
           rc.add_attrs(re.split(r'\s*,\s*', attrs), attr_loc)
@@ -297,10 +379,10 @@ class Parser(PA.BaseParser):
     elif name == 'teams':
       val = []
       for team_info in rhs:
-        if not M.match(r'\s*([A-Za-z][A-Za-z0-9_]*)\s*\(([^)]*)\)$', team_info):
+        if not m.match(r'\s*([A-Za-z][A-Za-z0-9_]*)\s*\(([^)]*)\)$', team_info):
           error(attr_loc, f"invalid team declaration: {team_info}")
-        team_name = M.group(1)
-        rc_names = re.split(r'\s*,\s*', M.group(2).strip())
+        team_name = m.group(1)
+        rc_names = re.split(r'\s*,\s*', m.group(2).strip())
         val.append(project.Team(team_name, rc_names, attr_loc))
     elif name == 'holidays':
       val = []
@@ -354,11 +436,11 @@ class Parser(PA.BaseParser):
 
     return block
 
-  def parse(self, W):
-    net_loc = project_loc = sched_loc = Location()
+  def parse_unit(self):
+    """Parse contents of a single file."""
+
+    unit = Unit(self.filename)
 
-    root_goals = []
-    root_blocks = []
     while True:
       l = self.lex.peek()
       if l is None:
@@ -367,30 +449,198 @@ class Parser(PA.BaseParser):
       if l.type == LexemeType.GOAL:
         error_if(l.data[0] != 0, l.loc, f"root goal '{l.data[1]}' must be left-adjusted")
         goal = self.parse_goal(l.data[0], None, False)
-        if not net_loc:
-          net_loc = goal.loc
-        root_goals.append(goal)
+        if not unit.net_loc:
+          unit.net_loc = goal.loc
+        unit.roots.append(goal)
       elif l.type == LexemeType.PRJ_ATTR:
-        if not project_loc:
-          project_loc = l.loc
+        if not unit.project_loc:
+          unit.project_loc = l.loc
         self.parse_project_attr()
       elif l.type == LexemeType.SCHED:
         error_if(l.data[0] != 0, l.loc, "root block must be left-adjusted")
         block = self.parse_sched_block(l.data[0])
-        if not sched_loc:
-          sched_loc = block.loc
-        root_blocks.append(block)
+        if not unit.sched_loc:
+          unit.sched_loc = block.loc
+        unit.blocks.append(block)
+      elif l.type == LexemeType.INCLUDE:
+        self.lex.skip()
+        unit.includes.append((l.data, l.loc))
       elif l.type == LexemeType.EOF:
         break
       else:
         # TODO: anonymous goals
         error(l.loc, f"unexpected lexeme: '{l.text}'")
 
-    net = G.Net(root_goals, W, net_loc)
+    unit.names = self.names
+    unit.attr_locs = self.attr_locs
+    unit.project_attrs = self.project_attrs
+    return unit
+
+  def parse(self, W):
+    unit = self.parse_unit()
+    units = [unit]
+    if unit.includes:
+      units += _parse_includes(unit)
+    self.files = [u.filename for u in units]
+    if len(units) > 1:
+      unit = _merge_units(units)
+
+    net = N.Net(unit.roots, W, unit.net_loc)
 
-    prj = project.Project(project_loc)
-    prj.add_attrs(self.project_attrs)
+    prj = project.Project(unit.project_loc)
+    prj.add_attrs(unit.project_attrs)
 
-    sched = schedule.SchedPlan(root_blocks, sched_loc)
+    sched = schedule.SchedPlan(unit.blocks, unit.sched_loc)
 
     return net, prj, sched
+
+class _GoalFrame:
+  """State of goal which is being parsed."""
+
+  __slots__ = ('goal', 'offset', 'other_goal', 'is_pred',
+               'was_defined', 'has_attrs', 'act')
+
+  def __init__(self, goal, offset, other_goal, *, is_pred, was_defined, has_attrs):
+    self.goal = goal
+    self.offset = offset
+    self.other_goal = other_goal
+    self.is_pred = is_pred
+    self.was_defined = was_defined
+    self.has_attrs = has_attrs
+    # Activity which connects goal to other_goal
+    self.act = None
+
+class Unit:
+  """Results of parsing a single file of a (multi-file) plan."""
+
+  def __init__(self, filename):
+    self.filename = filename
+    self.roots = []
+    self.blocks = []
+    self.names = {}
+    # Locations of goal occurences which had attributes
+    self.attr_locs = {}
+    self.project_attrs = {}
+    self.includes = []
+    self.net_loc = self.project_loc = self.sched_loc = Location()
+
+  def __getstate__(self):
+    # Units are sent back from worker processes, goals are stored
+    # in flat table to avoid deep recursion in pickle
+    table = G.GoalTable()
+    state = self.__dict__.copy()
+    state['roots'] = [table.goal_id(g) for g in self.roots]
+    state['names'] = {name: table.goal_id(g) for name, g in self.names.items()}
+    state['_goal_table'] = table.dump()
+    return state
+
+  def __setstate__(self, state):
+    goals = G.GoalTable.load(state.pop('_goal_table'))
+    self.__dict__.update(state)
+    self.roots = [goals[i] for i in self.roots]
+    self.names = {name: goals[i] for name, i in self.names.items()}
+
+def _parse_file(filename):
+  """Parse single included file (possibly in worker process)."""
+  with record_warnings(quiet=True) as warnings:
+    parser = Parser()
+    with platform.map_file(filename) as buf:
+      parser.reset(filename, buf)
+      unit = parser.parse_unit()
+  return warnings, unit
+
+def _parse_includes(unit):
+  """Parse all files included from unit (in parallel).
+
+     Units are returned in the order of discovery (breadth-first)."""
+
+  def resolve(unit):
+    base = os.path.dirname(unit.filename) if unit.filename != '<stdin>' else ''
+    for path, loc in unit.includes:
+      filename = os.path.join(base, path)
+      error_if(not os.path.isfile(filename), loc, f"included file '{path}' not found")
+      key = os.path.realpath(filename)
+      if key not in seen:
+        seen.add(key)
+        yield filename
+
+  seen = {os.path.realpath(unit.filename)}
+  units = []
+  filenames = list(resolve(unit))
+  futures = []
+  # Pool is only started if there are several files to parse
+  executor = None
+  try:
+    while filenames or futures:
+      if executor is None and len(filenames) > 1:
+        executor = ProcessPoolExecutor()
+      if executor is not None:
+        futures += [executor.submit(_parse_file, filename) for filename in filenames]
+        filenames = []
+        warnings, unit = futures.pop(0).result()
+      else:
+        warnings, unit = _parse_file(filenames.pop())
+      replay_warnings(warnings)
+      units.append(unit)
+      filenames += resolve(unit)
+  finally:
+    if executor is not None:
+      executor.shutdown()
+  return units
+
+def _merge_units(units):
+  """Merge per-file results into a single one.
+
+     Goals with the same names in different files are unified
+     as if files were concatenated (in order of units)."""
+
+  merged = Unit(units[0].filename)
+
+  dummy_goal_count = 0
+  for unit in units:
+    # Find goals which were already seen in previous files
+    remap = {}
+    for name, g in unit.names.items():
+      if g.dummy:
+        # Anonymous goals need unique names
+        g.name = f'dummy_{dummy_goal_count}'
+        dummy_goal_count += 1
+        merged.names[g.name] = g
+        continue
+      other = merged.names.get(name)
+      if other is None:
+        merged.names[name] = g
+        if name in unit.attr_locs:
+          merged.attr_locs[name] = unit.attr_locs[name]
+        continue
+      attr_loc = unit.attr_locs.get(name)
+      if attr_loc is not None:
+        error_if(other.defined, attr_loc,
+                 f"duplicate definition of goal '{name}' "
+                 f"(previous definition was in {other.loc})")
+        merged.attr_locs[name] = attr_loc
+      remap[g] = other
+      if other.defined and g.parent is not None:
+        # Goal was already defined so it shouldn't become a child here
+        g.parent.children.remove(g)
+        g.parent = None
+
+    # Redirect references to unified goals
+    for g in unit.names.values():
+      for act in g.preds + g.global_preds + g.succs + g.global_succs:
+        act.head = remap.get(act.head, act.head)
+        act.tail = remap.get(act.tail, act.tail)
+      g.children = [remap.get(c, c) for c in g.children]
+      g.parent = remap.get(g.parent, g.parent)
+
+    for g, other in remap.items():
+      other.merge(g)
+
+    merged.roots += [remap.get(g, g) for g in unit.roots]
+    merged.blocks += unit.blocks
+    merged.project_attrs.update(unit.project_attrs)
+    for attr in ('net_loc', 'project_loc', 'sched_loc'):
+      if not getattr(merged, attr):
+        setattr(merged, attr, getattr(unit, attr))
+
+  return merged
@@ -24,11 +24,12 @@ class Resource:
     self.vacations = []
 
   def add_attrs(self, attrs, loc):
+    m = M.Matcher()
     for a in attrs:
       if a[0].isdigit():
         self.efficiency = P.read_fraction(a, loc)
-      elif M.search(r'vacations?\s+(.*)', a):
-        duration = P.read_date2(M.group(1), loc)
+      elif m.search(r'vacations?\s+(.*)', a):
+        duration = P.read_date2(m.group(1), loc)
         self.vacations.append(duration)
       else:
         error(loc, f"unexpected resource attribute: {a}")
@@ -71,8 +72,11 @@ class Project:
     self.holidays = []
     self.tracker_link = 'http://jira.localhost/browse/%s'
     self.pr_link = None
+    # Compiled calendars (see calendar())
+    self._calendars = {}
 
   def _recompute(self):
+    self._calendars = {}
     self.members_map = {m.name : m for m in self.members}
     self.teams_map = {t.name : t for t in self.teams}
     if 'all' in self.teams_map:
@@ -94,6 +98,23 @@ class Project:
       setattr(self, k, v)
     self._recompute()
 
+  def calendar(self, rc=None):
+    """Returns calendar of project holidays or, if RC is given,
+       calendar of resource (which adds resource's vacations on top
+       of project calendar). Calendars are compiled on first use
+       and shared by all clients."""
+    # pylint: disable=import-outside-toplevel
+    from gaplan.schedule import HolidayCalendar
+    key = None if rc is None else rc.name
+    cal = self._calendars.get(key)
+    if cal is None:
+      if rc is None:
+        cal = HolidayCalendar(self.holidays)
+      else:
+        cal = HolidayCalendar(rc.vacations, self.calendar())
+      self._calendars[key] = cal
+    return cal
+
   def get_resources(self, names):
     """Returns resources that match a set of team/resource names."""
     resources = []
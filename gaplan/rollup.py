@@ -0,0 +1,166 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2022 Yury Gribov
+#
+# Use of this source code is governed by The MIT License (MIT)
+# that can be found in the LICENSE.txt file.
+
+"""Aggregation of effort, completed effort and remaining work over goals.
+
+Work of goal is the work of activities which precede it (both normal
+and global ones). Totals are available for hierarchical subtrees of goals
+(Rollup.subtree) and for transitive closures of dependencies (Rollup.closure).
+The latter count goals which are reachable via several paths only once.
+"""
+
+from gaplan.common.ETA import ETA
+from gaplan.goal import walk_goals
+
+def activity_effort(act, est=None):
+  """Single-point estimate of activity's effort in hours
+     (None if activity has no estimate). Actual effort is used
+     for completed activities and activities without estimates."""
+  effort = act.effort
+  if effort.real is not None \
+      and (effort.min is None or activity_completion(act) == 1):
+    return effort.real
+  if effort.min is None or effort.max is None:
+    return None
+  if est is not None:
+    avg, _ = est.estimate(act)
+    return avg
+  return (effort.min + effort.max) / 2
+
+def activity_completion(act):
+  """Fraction of activity's work which has been completed."""
+  frac = act.effort.completion
+  if act.tail is not None:
+    frac = max(frac, act.tail.complete() / 100)
+  return frac
+
+class Totals:
+  """Aggregated work of a set of goals (efforts are in hours)."""
+
+  __slots__ = ('min', 'max', 'estimate', 'done', 'goals', 'progress')
+
+  def __init__(self):
+    # Sums of optimistic and pessimistic estimates
+    self.min = self.max = 0
+    # Sums of single-point estimates of all and of completed work
+    self.estimate = self.done = 0
+    # Number of goals and sum of their completion fractions
+    self.goals = 0
+    self.progress = 0
+
+  @property
+  def remaining(self):
+    return max(0, self.estimate - self.done)
+
+  @property
+  def effort(self):
+    return ETA(self.min, self.max)
+
+  def add(self, other):
+    for attr in Totals.__slots__:
+      setattr(self, attr, getattr(self, attr) + getattr(other, attr))
+    return self
+
+  def __str__(self):
+    return f"{round(self.min)}h-{round(self.max)}h ({round(self.estimate)}h estimated, " \
+           f"{round(self.remaining)}h remaining)"
+
+def _goal_totals(g, est):
+  t = Totals()
+  t.goals = 1
+  t.progress = g.complete() / 100
+  for act in g.preds + g.global_preds:
+    estimate = activity_effort(act, est)
+    if estimate is None:
+      continue
+    if act.effort.min is not None:
+      t.min += act.effort.min
+      t.max += act.effort.max
+    else:
+      t.min += estimate
+      t.max += estimate
+    t.estimate += estimate
+    t.done += estimate * activity_completion(act)
+  return t
+
+class Rollup:
+  """Totals of work for all goals in network (see of()).
+     Totals are computed in a single bottom-up pass and cached."""
+
+  def __init__(self, net, est=None):
+    self.est = est
+    self._net = net
+    goals = net.goals
+
+    self.own = [_goal_totals(g, est) for g in goals]
+    self._total = Totals()
+    for t in self.own:
+      self._total.add(t)
+
+    # Hierarchical totals: sum children in postorder
+    self._subtree = [None] * len(goals)
+    roots = [g for g in goals if g.parent is None]
+    for g, _ in walk_goals(roots, bytearray(len(goals)),
+                           hierarchical=True, pre=False, post=True):
+      t = Totals().add(self.own[g.index])
+      for c in g.children:
+        t.add(self._subtree[c.index])
+      self._subtree[g.index] = t
+
+    # Closure of dependencies and prefix sums over its components
+    # (computed on first call to closure())
+    self._deps = self._prefix = None
+    self._closure = {}
+
+  def goal(self, g):
+    """Work of activities which immediately precede G."""
+    return self.own[g.index]
+
+  def subtree(self, g):
+    """Total work of G and its hierarchical descendants."""
+    return self._subtree[g.index]
+
+  def _init_closure(self):
+    # Transitive closure of goal is a union of intervals
+    # of components' numbers (see graph.Closure) so totals
+    # are differences of prefix sums over components
+    self._deps = deps = self._net._closure_index()  # pylint: disable=protected-access
+    comp_totals = [Totals() for _ in range(len(deps))]
+    for g in self._net.goals:
+      comp_totals[deps.component[g.index]].add(self.own[g.index])
+    self._prefix = prefix = [Totals()]
+    for t in comp_totals:
+      prefix.append(Totals().add(prefix[-1]).add(t))
+
+  def closure(self, g):
+    """Total work of G and all goals it (transitively) depends on."""
+    t = self._closure.get(g.index)
+    if t is None:
+      if self._deps is None:
+        self._init_closure()
+      t = Totals()
+      for start, end in self._deps.runs(self._deps.component[g.index]):
+        hi = self._prefix[end + 1]
+        lo = self._prefix[start]
+        for attr in Totals.__slots__:
+          setattr(t, attr, getattr(t, attr) + getattr(hi, attr) - getattr(lo, attr))
+      self._closure[g.index] = t
+    return t
+
+  def total(self):
+    """Total work of all goals in network."""
+    return self._total
+
+def of(net, est=None):
+  """Returns totals of effort, completed effort and remaining work
+     of goals of NET. EST is an optional estimator which is used
+     for single-point estimates of activities. Totals are computed
+     on first call and reused until network is recomputed."""
+  rollup = net.analyses.get('rollup')
+  if rollup is None or rollup.est is not est:
+    rollup = net.analyses['rollup'] = Rollup(net, est)
+  return rollup
@@ -11,6 +11,8 @@
 
 import datetime
 import sys
+import copy
+import bisect
 import logging
 
 from gaplan.common.error import error, error_if, warn
@@ -42,12 +44,13 @@ class SchedBlock:
     self.blocks.append(block)
 
   def add_attrs(self, attrs, loc):
+    m = M.Matcher()
     for a in attrs:
       if a.startswith('@'):
         self.alloc, _ = PA.read_alloc(a, loc)
         continue
 
-      if M.search(r'^[0-9]{4}-', a):
+      if m.search(r'^[0-9]{4}-', a):
         self.duration = PA.read_date2(a, loc)
         continue
 
@@ -55,10 +58,10 @@ class SchedBlock:
         self.parallel = PA.read_par(a)
         continue
 
-      if not M.search(r'^([a-z_0-9]+)\s*(.*)', a):
+      if not m.search(r'^([a-z_0-9]+)\s*(.*)', a):
         error(loc, f"failed to parse block attribute: {a}")
-      k = M.group(1).strip()
-      v = M.group(2).strip()
+      k = m.group(1).strip()
+      v = m.group(2).strip()
 
       if k == 'deadline':
         self.deadline, _ = PA.read_date(v, loc)
@@ -66,6 +69,25 @@ class SchedBlock:
 
       error(loc, f"unknown block attribute '{k}'")
 
+  def restrict(self, names):
+    """Returns copy of block which only schedules goals with NAMES
+       (or None if no such goals are left)."""
+    if self.goal_name is not None:
+      return self if self.goal_name in names else None
+    blocks = [b for b in (b.restrict(names) for b in self.blocks) if b is not None]
+    if not blocks:
+      return None
+    block = copy.copy(self)
+    block.blocks = blocks
+    return block
+
+  def goal_names(self):
+    """Iterate over goals scheduled in block."""
+    if self.goal_name is not None:
+      yield self.goal_name
+    for b in self.blocks:
+      yield from b.goal_names()
+
   def dump(self, p):
     block_type = "Sequential" if self.seq else "Parallel"
     p.writeln(f"{block_type} sched block ({self.loc})")
@@ -91,6 +113,15 @@ class SchedPlan:
     self.blocks = blocks
     self.loc = loc
 
+  def restrict(self, names):
+    """Returns plan which only schedules goals with NAMES."""
+    blocks = [b for b in (b.restrict(names) for b in self.blocks) if b is not None]
+    return SchedPlan(blocks, self.loc)
+
+  def goal_names(self):
+    """Returns names of goals scheduled in plan."""
+    return {name for b in self.blocks for name in b.goal_names()}
+
   def dump(self, p):
     p.writeln(f"= SchedPlan at {self.loc} =\n")
     p.writeln("Blocks:")
@@ -100,30 +131,133 @@ class SchedPlan:
     p.writeln("")
 
 class HolidayCalendar:
-  """Holds info about holidays."""
+  """Holds info about holidays.
+
+     Calendars can be layered: calendar with a BASE (e.g. calendar
+     of a particular resource on top of calendar of project) only
+     stores its own holidays and uses compiled days of its base.
 
-  def __init__(self, holidays):
+     Working days are compiled (on demand) into a sorted list
+     of their ordinals and a list of cumulative working hours
+     so that effort queries are reduced to binary searches."""
+
+  # Working hours in a day
+  # TODO: hour-based precision
+  DAY_HOURS = 8
+
+  # Minimal number of days which are compiled at once
+  MIN_SPAN = 366
+
+  def __init__(self, holidays, base=None):
     self.holidays = I.Seq(holidays)
+    self.base = base
+    # Compiled range of days [first, last) (as ordinals)
+    self._first = self._last = None
+    # Ordinals of working days in compiled range
+    self._days = []
+    # Total working hours in compiled range up to (and including) each working day
+    self._hours = []
+    # Working days of base calendar which are holidays in this one (sorted ordinals)
+    self._excluded = []
+    if base is not None:
+      for iv in self.holidays.ivs:
+        d = iv.start
+        while d < iv.finish:
+          if base.is_working_day(d):
+            self._excluded.append(d.toordinal())
+          d += datetime.timedelta(days=1)
+
+  def is_working_day(self, d):
+    if self.holidays.contains(d):
+      return False
+    if self.base is not None:
+      return self.base.is_working_day(d)
+    return d.weekday() < 5
+
+  def _compile(self, first, last):
+    """Compute working days in [FIRST, LAST) (day ordinals)."""
+    n = last - first
+    off = bytearray(n)
+    for iv in self.holidays.ivs:
+      lo = max(iv.start.toordinal(), first) - first
+      hi = min(iv.finish.toordinal(), last) - first
+      if lo < hi:
+        off[lo:hi] = b'\1' * (hi - lo)
+    # Day ordinal 1 (0001-01-01) is Monday
+    days = [first + i for i in range(n) if not off[i] and (first + i + 6) % 7 < 5]
+    self._days = days
+    self._hours = [self.DAY_HOURS * (k + 1) for k in range(len(days))]
+    self._first = first
+    self._last = last
+
+  def _ensure(self, first, last):
+    """Make sure that days in [FIRST, LAST) are compiled."""
+    if self._first is not None:
+      if self._first <= first and last <= self._last:
+        return
+      first = min(first, self._first)
+      # Grow geometrically to amortize recompilations
+      last = max(last, self._last + (self._last - self._first))
+    self._compile(first, max(last, first + self.MIN_SPAN))
+
+  def compiled(self, first, last):
+    """Compile days in [FIRST, LAST) (day ordinals) if needed.
+       Returns ordinals of working days, cumulative working hours
+       and end of compiled range (which may be larger than LAST)."""
+    self._ensure(first, last)
+    return self._days, self._hours, self._last
+
+  def _num_excluded(self, first, last):
+    """Number of excluded days in [FIRST, LAST] (day ordinals)."""
+    return bisect.bisect_right(self._excluded, last) \
+      - bisect.bisect_left(self._excluded, first)
 
   def allows_effort(self, iv, effort):
-    """Checks whether we have enough working hours in interval of time."""
+    """Checks whether we have enough working hours in interval of time.
+       Returns the shortest interval at the start of IV which has them."""
     ndays = (iv.finish - iv.start).days
     # Fast check
-    if ndays * 8 < effort:
+    if ndays * self.DAY_HOURS < effort:
       return False, None
-    # Slow check
-    # TODO: do this faster
-    # TODO: hour-based precision
-    start = None
-    for day in range(ndays):
-      d = iv.start + datetime.timedelta(days=day)
-      if d.weekday() < 5 and not self.holidays.contains(d):
-        if start is None:
-          start = d
-        effort -= 8
-      if effort <= 0:
-        return True, I.Interval(start, d, closed=True)
-    return False, None
+    start = iv.start.toordinal()
+    finish = iv.finish.toordinal()
+    cal = self if self.base is None else self.base
+    # Intervals may be unbounded (end in MAXYEAR)
+    # so only compile as much as needed
+    last = min(finish, start + self.MIN_SPAN)
+    while True:
+      days, hours, compiled_last = cal.compiled(start, last)
+      i = bisect.bisect_left(days, start)
+      while i < len(days) and self._num_excluded(days[i], days[i]):
+        i += 1
+      base = hours[i - 1] if i > 0 else 0
+      # Skip excluded days until we reach a fixpoint
+      # (number of iterations is bounded by number of excluded days)
+      num_excluded = 0
+      while True:
+        j = _find_effort(hours, i, base + self.DAY_HOURS * num_excluded, effort)
+        if j >= len(days):
+          break
+        n = self._num_excluded(days[i], days[j])
+        if n == num_excluded:
+          break
+        num_excluded = n
+      if j < len(days) and days[j] < finish:
+        return True, I.Interval(datetime.date.fromordinal(days[i]),
+                                datetime.date.fromordinal(days[j]), closed=True)
+      if compiled_last >= finish:
+        return False, None
+      last = min(finish, compiled_last + (compiled_last - start))
+
+def _find_effort(hours, i, base, effort):
+  """Find first J >= I such that HOURS[J] - BASE >= EFFORT."""
+  j = bisect.bisect_left(hours, base + effort, i)
+  # Fix rounding errors in BASE + EFFORT
+  while j > i and hours[j - 1] - base >= effort:
+    j -= 1
+  while j < len(hours) and hours[j] - base < effort:
+    j += 1
+  return j
 
 class GoalInfo:
   """Represents info about scheduled goal."""
@@ -151,11 +285,11 @@ class ActivityInfo:
 class ResourceInfo:
   """Represents info about resource allocations."""
 
-  def __init__(self, rc, holidays):
+  def __init__(self, rc, cal):
     self.rc = rc
     self.name = rc.name
     self.sheet = []
-    self.cal = HolidayCalendar(holidays + rc.vacations)
+    self.cal = cal
 
   def allocate(self, start, effort):
     if not self.sheet:
@@ -166,15 +300,20 @@ class ResourceInfo:
 
     logger.debug(f"allocate: allocating effort {effort} @{self.name} from {start}")
 
+    # This is the innermost loop of scheduler so avoid formatting
+    # debug messages unless needed
+    debug = logger.isEnabledFor(logging.DEBUG)
     last_iv = I.Interval(datetime.date(datetime.MAXYEAR, 12, 31))
     for i, (left, right) in enumerate(zip(self.sheet, self.sheet[1:] + [last_iv])):
       if start >= right.start:
         continue
       gap = I.Interval(max(left.finish, start), right.start)
-      logger.debug(f"allocate: found free slot {gap}")
+      if debug:
+        logger.debug(f"allocate: found free slot {gap}")
       ok, iv = self.cal.allows_effort(gap, effort)
       if not ok:
-        logger.debug(f"allocate: slot {gap} rejected due to holidays")
+        if debug:
+          logger.debug(f"allocate: slot {gap} rejected due to holidays")
         continue
       logger.debug(f"allocate: updated due to holidays: {iv}")
       fragmentation = iv.start - left.finish
@@ -198,7 +337,7 @@ class Schedule:
     self.acts = {}
     self.rcs = {}
     for rc in prj.members:
-      self.rcs[rc.name] = ResourceInfo(rc, prj.holidays)
+      self.rcs[rc.name] = ResourceInfo(rc, prj.calendar(rc))
 
   def is_completed(self, goal):
     return goal.name in self.goals
@@ -259,6 +398,13 @@ class Schedule:
 
     return total_iv, total_rcs
 
+  def restrict(self, goals):
+    """Only keep info about GOALS (and activities which lead to them)."""
+    names = {g.name for g in goals}
+    self.goals = {name: info for name, info in self.goals.items() if name in names}
+    self.acts = {name: info for name, info in self.acts.items()
+                 if info.act.tail is not None and info.act.tail.name in names}
+
   def dump(self, p):
     p.writeln("= Schedule =\n")
 
@@ -0,0 +1,20 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2022 Yury Gribov
+#
+# Use of this source code is governed by The MIT License (MIT)
+# that can be found in the LICENSE.txt file.
+
+"""Helpers which are shared by tests."""
+
+import gaplan.parse as P
+from gaplan.common.error import record_warnings
+
+def parse_net(text, quiet=False):
+  """Parse plan TEXT and return its network.
+     If QUIET is set, warnings are not printed."""
+  parser = P.Parser()
+  parser.reset('test.txt', text)
+  with record_warnings(quiet=quiet):
+    net, _, _ = parser.parse(0)
+  return net
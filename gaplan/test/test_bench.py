@@ -0,0 +1,44 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2022 Yury Gribov
+#
+# Use of this source code is governed by The MIT License (MIT)
+# that can be found in the LICENSE.txt file.
+
+import io
+import json
+
+import pytest
+
+import gaplan.parse as PA
+from gaplan.bench import synth
+from gaplan.bench import harness
+
+def test_synth():
+  text = synth.generate(goals=50, components=3, depth=2, fanin=2, seed=1)
+  assert text == synth.generate(goals=50, components=3, depth=2, fanin=2, seed=1)
+  parser = PA.Parser()
+  parser.reset('synth.txt', text)
+  net, prj, sched_plan = parser.parse(0)
+  assert len(net.name_to_goal) == 50
+  assert len(prj.members) == synth.DEFAULTS['members']
+  assert len(sched_plan.blocks) == synth.DEFAULTS['blocks']
+
+def test_harness():
+  text = synth.generate(goals=20)
+  res = harness.run('synth', text, repeat=2)
+  for stage in ['parse', 'recompute', 'check', 'wbs', 'schedule', 'export-tj', 'export-pert']:
+    assert len(res['stages'][stage]['times']) == 2, stage
+  assert 'propagate' in res['stages']['recompute']['substages']
+  report = harness.make_report([res], 2)
+  report = json.loads(json.dumps(report))
+  out = io.StringIO()
+  assert harness.compare(report, report, out=out) == 0
+  assert 'parse' in out.getvalue()
+  # Stage which fails only in new run is a regression
+  failed = json.loads(json.dumps(report))
+  failed['results'][0]['stages']['wbs'] = {'error': 'KeyError'}
+  out = io.StringIO()
+  assert harness.compare(report, failed, out=out) == 1
+  assert 'KeyError' in out.getvalue()
+  assert harness.compare(failed, report, out=io.StringIO()) == 0
@@ -0,0 +1,53 @@
+# The MIT License (MIT)
+# 
+# Copyright (c) 2018-2022 Yury Gribov
+# 
+# Use of this source code is governed by The MIT License (MIT)
+# that can be found in the LICENSE.txt file.
+
+import os
+
+import gaplan.__main__ as M
+import gaplan.cache as C
+from gaplan.bench import synth
+from gaplan.common.error import record_warnings
+
+def test_roundtrip(tmp_path):
+  cache = C.PlanCache(str(tmp_path))
+  key = cache.key('plan.txt', '|Goal\n', 0)
+  assert cache.load(key) is None
+  cache.store(key, ['a', 1])
+  assert cache.load(key) == ['a', 1]
+
+def test_key():
+  assert C.PlanCache.key('plan.txt', '|Goal\n', 0) != C.PlanCache.key('plan.txt', '|Goal 2\n', 0)
+  assert C.PlanCache.key('plan.txt', '|Goal\n', 0) != C.PlanCache.key('plan.txt', '|Goal\n', 1)
+
+def test_evict(tmp_path):
+  cache = C.PlanCache(str(tmp_path), max_size=2500)
+  keys = [cache.key('plan.txt', str(i), 0) for i in range(3)]
+  for i, key in enumerate(keys[:2]):
+    cache.store(key, 'x' * 1000)
+    # Make sure that mtimes differ
+    os.utime(cache._entry(key), (i, i))
+  # Entry 0 becomes most recently used
+  cache.load(keys[0])
+  cache.store(keys[2], 'x' * 1000)
+  assert cache.load(keys[0]) is not None
+  assert cache.load(keys[1]) is None
+  assert cache.load(keys[2]) is not None
+
+def test_large_plan(tmp_path):
+  text = synth.generate(goals=5000, fanin=2)
+  cache = C.PlanCache(str(tmp_path))
+  with record_warnings(quiet=True) as warnings:
+    net, _, _ = M._parse_plan('plan.txt', text, 0, cache)
+  assert not any('cache' in w for w in warnings)
+  assert cache.load(cache.key('plan.txt', text, 0)) is not None
+
+  cached_net, _, _ = M._parse_plan('plan.txt', text, 0, cache)
+  assert cached_net is not net
+  assert [g.name for g in cached_net.goals] == [g.name for g in net.goals]
+  g = cached_net.name_to_goal['Goal 0']
+  assert all(act.tail is g for act in g.preds)
+  assert [g.name for g in cached_net.roots] == [g.name for g in net.roots]
@@ -0,0 +1,82 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2022 Yury Gribov
+#
+# Use of this source code is governed by The MIT License (MIT)
+# that can be found in the LICENSE.txt file.
+
+import datetime
+import random
+
+import gaplan.common.interval as I
+from gaplan.schedule import HolidayCalendar
+
+def _date(s):
+  return datetime.datetime.strptime(s, '%Y-%m-%d').date()
+
+def _allows_effort(cal, iv, effort):
+  """Reference implementation which walks days one by one."""
+  start = None
+  d = iv.start
+  while d < iv.finish:
+    if d.weekday() < 5 and not cal.holidays.contains(d):
+      if start is None:
+        start = d
+      effort -= 8
+      if effort <= 0:
+        return True, I.Interval(start, d, closed=True)
+    d += datetime.timedelta(days=1)
+  return False, None
+
+def test_allows_effort():
+  # 2022-01-03 is Monday
+  cal = HolidayCalendar([I.Interval(_date('2022-01-05'), _date('2022-01-07'))])
+  ok, iv = cal.allows_effort(I.Interval(_date('2022-01-01'), _date('2022-01-31')), 20)
+  assert ok
+  assert iv == I.Interval(_date('2022-01-03'), _date('2022-01-07'), closed=True)
+  ok, _ = cal.allows_effort(I.Interval(_date('2022-01-05'), _date('2022-01-08')), 16)
+  assert not ok
+  # Unbounded intervals
+  ok, iv = cal.allows_effort(I.Interval(_date('2022-01-01'), datetime.date(datetime.MAXYEAR, 12, 31)), 8 * 1000)
+  assert ok and iv.start == _date('2022-01-03')
+
+def test_random():
+  rng = random.Random(0)
+  base = _date('2022-01-01')
+  for _ in range(200):
+    holidays = []
+    for _ in range(rng.randint(0, 5)):
+      start = base + datetime.timedelta(days=rng.randint(0, 500))
+      holidays.append(I.Interval(start, start + datetime.timedelta(days=rng.randint(0, 20))))
+    cal = HolidayCalendar(holidays)
+    for _ in range(10):
+      start = base + datetime.timedelta(days=rng.randint(-50, 600))
+      iv = I.Interval(start, start + datetime.timedelta(days=rng.randint(0, 400)))
+      effort = rng.choice([rng.uniform(1, 1000), 8 * rng.randint(1, 100)])
+      ok, res = cal.allows_effort(iv, effort)
+      ok_ref, res_ref = _allows_effort(cal, iv, effort)
+      assert ok == ok_ref
+      assert not ok or res == res_ref
+
+def test_layers():
+  rng = random.Random(1)
+  base = _date('2022-01-01')
+  def random_ivs(n, length):
+    ivs = []
+    for _ in range(n):
+      start = base + datetime.timedelta(days=rng.randint(0, 500))
+      ivs.append(I.Interval(start, start + datetime.timedelta(days=rng.randint(0, length))))
+    return ivs
+  for _ in range(100):
+    holidays = random_ivs(rng.randint(0, 5), 10)
+    vacations = random_ivs(rng.randint(0, 3), 30)
+    project = HolidayCalendar(holidays)
+    # Resource calendar is layered on top of project one
+    # and should behave as a flat calendar with all holidays
+    cal = HolidayCalendar(vacations, project)
+    flat = HolidayCalendar(holidays + vacations)
+    for _ in range(10):
+      start = base + datetime.timedelta(days=rng.randint(-50, 600))
+      iv = I.Interval(start, start + datetime.timedelta(days=rng.randint(0, 400)))
+      effort = rng.uniform(1, 1000)
+      assert cal.allows_effort(iv, effort) == flat.allows_effort(iv, effort)
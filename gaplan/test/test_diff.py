@@ -0,0 +1,72 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2022 Yury Gribov
+#
+# Use of this source code is governed by The MIT License (MIT)
+# that can be found in the LICENSE.txt file.
+
+import gaplan.diff as D
+
+from helpers import parse_net
+
+OLD = '''\
+|A
+|<-
+   |B
+   |[] Check
+   |<-  // @dev1, 1d
+      |C
+      |<-
+         |D
+         |<-  // 1w
+|E
+|<-
+   |F
+'''
+
+def test_no_changes():
+  assert D.diff(parse_net(OLD, quiet=True), parse_net(OLD, quiet=True)) == []
+
+def test_diff():
+  new = OLD.replace('[] Check', '[X] Check') \
+           .replace('|<-  // 1w', '|<-  // 2w') \
+           .replace('   |F\n', '') \
+           + '|G\n'
+  changes = D.diff(parse_net(OLD, quiet=True), parse_net(new, quiet=True))
+  summary = [(c.kind, c.name) for c in changes]
+  assert summary == [
+    (D.Change.MODIFIED, 'B'),
+    (D.Change.MODIFIED, 'D'),
+    (D.Change.MODIFIED, 'E'),
+    (D.Change.ADDED, 'G'),
+    (D.Change.REMOVED, 'F'),
+  ]
+  assert changes[0].details == ["completion: 0% -> 100%",
+                                "check 'Check': [] -> [X]"]
+  assert len(changes[1].details) == 1
+  assert changes[1].details[0].startswith("activity: effort 40h")
+  assert changes[2].details == ["added activity", "removed dependency on 'F'"]
+
+def test_moved():
+  new = '''\
+|A
+|<-
+   |B
+   |[] Check
+   |<-  // @dev1, 1d
+      |C
+|E
+|<-
+   |F
+   |<-
+      |D
+      |<-  // 1w
+'''
+  changes = D.diff(parse_net(OLD, quiet=True), parse_net(new, quiet=True))
+  summary = [(c.kind, c.name) for c in changes]
+  assert summary == [
+    (D.Change.MODIFIED, 'C'),
+    (D.Change.MODIFIED, 'F'),
+    (D.Change.MOVED, 'D'),
+  ]
+  assert changes[2].details == ["moved from 'C' to 'F'"]
@@ -0,0 +1,80 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2022 Yury Gribov
+#
+# Use of this source code is governed by The MIT License (MIT)
+# that can be found in the LICENSE.txt file.
+
+import datetime
+
+import pytest
+
+import gaplan.filter as F
+from gaplan.bench import synth
+
+from helpers import parse_net
+
+def _assigned(g, name):
+  return any(name in act.alloc or name in act.real_alloc for act in g.preds)
+
+def test_filter():
+  net = parse_net(synth.generate(goals=300, fanin=2))
+  date = datetime.date(2021, 6, 1)
+  cases = [
+    ('prio >= 2', lambda g: g.prio is not None and g.prio >= 2),
+    ('prio>=2 and @dev1', lambda g: g.prio is not None and g.prio >= 2 and _assigned(g, 'dev1')),
+    ('not (@team0 or risk=3)', lambda g: not (_assigned(g, 'team0') or g.risk == 3)),
+    ('deadline < 2021-06-01', lambda g: g.deadline is not None and g.deadline < date),
+    ('deadline != 2021-06-01', lambda g: g.deadline is not None and g.deadline != date),
+    ('pending or completed', lambda g: g.is_completed() or any(not c.done() for c in g.checks)),
+  ]
+  for text, pred in cases:
+    goals = F.compile_filter(text).select(net)
+    assert goals == [g for g in net.goals if pred(g)], text
+
+@pytest.mark.parametrize('text', ['prio >', 'prio > x', '(@dev1', 'deadline < 2021', 'foo', '@', 'prio > 1 1'])
+def test_filter_errors(text):
+  with pytest.raises(SystemExit):
+    F.compile_filter(text)
+
+def test_tracker():
+  net = parse_net('''\
+|A  // task PRJ-1
+|<-  // PR 12/13, 1h
+   |B  // task PRJ-2/PRJ-3
+   |<-  // task PRJ-4
+      |C
+''')
+  cases = [
+    ('task PRJ-1', ['A']),
+    ('task PRJ-3', ['B']),
+    ('task PRJ-4', ['B']),
+    ('PR 12', ['A']),
+    ('pr 13 or task PRJ-2', ['A', 'B']),
+    ('task task', []),
+    ('PR PR', []),
+  ]
+  for text, names in cases:
+    goals = F.compile_filter(text).select(net)
+    assert sorted(g.name for g in goals) == names, text
+
+def test_subnet():
+  net = parse_net('''\
+|A  // !3
+|<-
+   |B
+   |<-  // @dev1, 1d
+      |C
+   |<-
+      |D
+''')
+  goals = F.compile_filter('@dev1 or not pending').select(net)
+  sub = net.subnet(goals)
+  assert sorted(sub.name_to_goal) == ['A', 'B', 'C', 'D']
+  goals = [g for g in net.goals if g.name in ('B', 'C')]
+  sub = net.subnet(goals)
+  assert sorted(sub.name_to_goal) == ['B', 'C']
+  b = sub.name_to_goal['B']
+  assert b.parent is None and [act.head.name for act in b.preds] == ['C']
+  # Original network is not modified
+  assert len(net.name_to_goal['B'].preds) == 2
@@ -0,0 +1,79 @@
+# The MIT License (MIT)
+# 
+# Copyright (c) 2018-2022 Yury Gribov
+# 
+# Use of this source code is governed by The MIT License (MIT)
+# that can be found in the LICENSE.txt file.
+
+import datetime
+import pickle
+
+import gaplan.goal as G
+from gaplan.common.location import Location
+
+from helpers import parse_net
+
+def test_tracker():
+  loc = Location('plan.txt', 1)
+  g = G.Goal('A', loc)
+  assert not g.has_tracker()
+  act = G.Activity(loc)
+  act.add_attrs(['task 123/456', '1h'], loc)
+  assert act.has_tracker() and not g.has_tracker()
+  g2 = G.Goal('A', loc)
+  g2.tracker.prs.add('7')
+  g.merge(g2)
+  assert g.tracker.prs == {'7'}
+
+def test_pickle():
+  loc = Location('plan.txt', 1)
+  g = G.Goal('A', loc)
+  act = G.Activity(loc)
+  act.set_endpoints(None, g, True)
+  g.add_activity(act, True)
+  g2 = pickle.loads(pickle.dumps(g))
+  assert g2.preds[0].head is g2 and g2.loc.lineno == 1
+  assert not hasattr(g2, '__dict__')
+
+def test_memoization():
+  net = parse_net('''\
+|A  // !3
+|[X] Check 1
+|[] Check 2
+|<-
+   |<-
+      |B
+   |<-
+      |C
+''')
+  a = net.name_to_goal['A']
+  assert a.complete() == 50
+  a.add_check(G.Condition('Check 3', 'X', a.loc))
+  assert a.complete() == 67
+  a.completion_date = datetime.date(2020, 1, 1)
+  assert a.is_completed()
+
+  prio = a.priority()
+  a.risk = G.Risk.LOW
+  assert a.priority() != prio
+
+  dummy = a.preds[0].head
+  assert dummy.dummy and dummy.pretty_name == 'B, C'
+  d = G.Goal('D', a.loc)
+  act = G.Activity(a.loc)
+  act.set_endpoints(dummy, d, True)
+  dummy.add_activity(act, True)
+  d.add_activity(act, False)
+  assert dummy.pretty_name == 'B, C, D'
+
+def test_add_activity():
+  loc = Location('plan.txt', 1)
+  hub = G.Goal('Hub', loc)
+  acts = []
+  for i in range(3 * G._ACT_INDEX_MIN):
+    act = G.Activity(loc)
+    act.set_endpoints(hub, G.Goal(f'Goal {i}', loc), True)
+    acts.append(act)
+  for act in acts + acts[::-1]:
+    hub.add_activity(act, True)
+  assert hub.preds == acts
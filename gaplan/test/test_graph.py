@@ -0,0 +1,130 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2022 Yury Gribov
+#
+# Use of this source code is governed by The MIT License (MIT)
+# that can be found in the LICENSE.txt file.
+
+import math
+
+from gaplan.bench import synth
+import gaplan.rollup as R
+
+from helpers import parse_net
+
+def test_arrays():
+  net = parse_net(synth.generate(goals=200, fanin=2))
+  arrays = net.arrays()
+  assert arrays is net.arrays()
+  assert len(arrays) == len(net.goals)
+  for g in net.goals:
+    i = g.index
+    assert list(arrays.preds.neighbours(i)) == [act.head.index for act in g.preds if act.head]
+    assert list(arrays.succs.neighbours(i)) == [act.tail.index for act in g.succs if act.tail]
+    assert list(arrays.children.neighbours(i)) == [c.index for c in g.children]
+    assert arrays.parent[i] == (-1 if g.parent is None else g.parent.index)
+    assert arrays.completion[i] == g.complete()
+    for a in arrays.pred_acts.neighbours(i):
+      act = arrays.activities[a]
+      assert act.tail is g and arrays.act_head[a] == act.head.index
+      assert arrays.effort_min[a] == act.effort.min
+      if act.effort.real is None:
+        assert math.isnan(arrays.effort_real[a])
+  assert arrays.preds.num_edges() == arrays.succs.num_edges()
+
+def test_empty_goal():
+  net = parse_net('''\
+|A
+|<-
+   |B
+''')
+  arrays = net.arrays()
+  b = net.name_to_goal['B'].index
+  assert arrays.preds.degree(b) == 0 and arrays.iter[b] == -1
+  net._recompute(0)  # pylint: disable=protected-access
+  assert net.arrays() is not arrays
+
+def test_global_deps():
+  net = parse_net('''\
+|A
+|<-  // global
+   |B
+|<-  // 1h
+   |C
+''')
+  arrays = net.arrays()
+  a, c = (net.name_to_goal[name].index for name in 'AC')
+  # B is only reachable via global dependency so it's not part of network
+  assert 'B' not in net.name_to_goal
+  assert list(arrays.global_preds.neighbours(a)) == []
+  assert list(arrays.preds.neighbours(a)) == [c]
+  assert sorted(arrays.act_head) == [-1, c]
+  assert list(arrays.act_tail) == [a, a]
+
+def _reachable(g):
+  seen = set()
+  stack = [g]
+  while stack:
+    for h in stack.pop().preds:
+      if h.head is not None and h.head not in seen:
+        seen.add(h.head)
+        stack.append(h.head)
+  return seen
+
+def test_reachability():
+  net = parse_net(synth.generate(goals=150, components=2, fanin=3))
+  for a in net.goals:
+    ancestors = set()
+    p = a.parent
+    while p is not None:
+      ancestors.add(p)
+      p = p.parent
+    deps = _reachable(a)
+    for b in net.goals:
+      assert net.is_ancestor(b, a) == (b in ancestors)
+      assert net.depends_on(a, b) == (b in deps)
+
+def test_reachability_cycles():
+  net = parse_net('''\
+|A
+|<-
+   |B
+   |<-
+      |C
+      |<-
+         |A
+|D
+|<-
+   |C
+''')
+  A, B, C, D = (net.name_to_goal[name] for name in 'ABCD')
+  assert net.depends_on(A, C) and net.depends_on(C, A) and net.depends_on(A, A)
+  assert net.depends_on(D, A) and not net.depends_on(A, D) and not net.depends_on(D, D)
+
+def test_reachability_global():
+  # B is only reachable via global dependency so it's not part of network
+  net = parse_net('''\
+|A
+|<-  // global
+   |B
+|<-  // 1h
+   |C
+''')
+  A, C = net.name_to_goal['A'], net.name_to_goal['C']
+  assert net.depends_on(A, C) and not net.depends_on(C, A)
+  assert R.of(net).closure(A).estimate == 1
+
+def test_lazy_closure():
+  net = parse_net(synth.generate(goals=100, fanin=2))
+  a, b = net.goals[0], net.goals[-1]
+  rollup = R.of(net)
+  rollup.subtree(a)
+  rollup.total()
+  net.is_ancestor(a, b)
+  # Closure of dependencies is only computed when it's needed
+  assert net._closure is None  # pylint: disable=protected-access
+  closure = rollup.closure(a)
+  assert net._closure is not None  # pylint: disable=protected-access
+  deps = _reachable(a)
+  assert closure.goals == 1 + len(deps - {a})
+  assert math.isclose(closure.estimate, sum(rollup.goal(g).estimate for g in deps | {a}))
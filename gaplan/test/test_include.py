@@ -0,0 +1,80 @@
+# The MIT License (MIT)
+# 
+# Copyright (c) 2018-2022 Yury Gribov
+# 
+# Use of this source code is governed by The MIT License (MIT)
+# that can be found in the LICENSE.txt file.
+
+import pytest
+
+import gaplan.parse as P
+
+def _parse(path):
+  parser = P.Parser()
+  with open(path) as f:
+    parser.reset(str(path), f)
+    return parser.parse(0)
+
+def test_include(tmp_path):
+  (tmp_path / 'main.txt').write_text('''\
+name = Test
+include "sub/team.txt"
+
+|Release  // !3
+|<-
+   |Team done
+|<-  // 1h
+''')
+  (tmp_path / 'sub').mkdir()
+  (tmp_path / 'sub' / 'team.txt').write_text('''\
+include "../main.txt"
+
+|Team done
+|[] Check
+|<-  // 1d
+   |Lib ready
+|<-  // 2h
+''')
+
+  net, prj, _ = _parse(tmp_path / 'main.txt')
+  assert prj.name == 'Test'
+  release = net.name_to_goal['Release']
+  team = net.name_to_goal['Team done']
+  assert team.defined and team in net.roots
+  assert release.preds[0].head is team
+  assert team.succs[0].tail is release
+  assert team.prio == 3
+  assert team.checks[0].loc.filename.endswith('team.txt')
+  dummies = sorted(name for name in net.name_to_goal if name.startswith('dummy_'))
+  assert dummies == ['dummy_0', 'dummy_1']
+
+def test_duplicate_definition(tmp_path):
+  (tmp_path / 'main.txt').write_text('include "team.txt"\n|Goal  // !1\n')
+  (tmp_path / 'team.txt').write_text('|Goal  // !2\n')
+  with pytest.raises(SystemExit):
+    _parse(tmp_path / 'main.txt')
+
+def _chain(prefix, n):
+  """Text of plan in which goals form a long chain of dependencies."""
+  lines = []
+  for i in range(n):
+    lines += [f'|{prefix} {i}', '|<-  // 1h', f'   |{prefix} {i + 1}', '']
+  return '\n'.join(lines)
+
+@pytest.mark.parametrize('num_includes', [1, 2])
+def test_large_include(tmp_path, monkeypatch, num_includes):
+  includes = ''.join(f'include "part{i}.txt"\n' for i in range(num_includes))
+  (tmp_path / 'main.txt').write_text(includes + '\n|Release\n|<-  // 1h\n   |Part0 0\n')
+  for i in range(num_includes):
+    (tmp_path / f'part{i}.txt').write_text(_chain(f'Part{i}', 3000))
+
+  if num_includes == 1:
+    # Single include is parsed in-process
+    monkeypatch.delattr(P, 'ProcessPoolExecutor')
+
+  net, _, _ = _parse(tmp_path / 'main.txt')
+  g = net.name_to_goal['Release']
+  for _ in range(3001):
+    g, = [act.head for act in g.preds]
+  assert g.name == 'Part0 3000'
+  assert f'Part{num_includes - 1} 3000' in net.name_to_goal
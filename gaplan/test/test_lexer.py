@@ -0,0 +1,73 @@
+# The MIT License (MIT)
+# 
+# Copyright (c) 2018-2022 Yury Gribov
+# 
+# Use of this source code is governed by The MIT License (MIT)
+# that can be found in the LICENSE.txt file.
+
+import pytest
+
+import gaplan.parse as P
+from gaplan.common import platform
+
+def _lex(text):
+  lex = P.Lexer()
+  lex.reset('test.txt', iter(text.splitlines(True)))
+  lexemes = []
+  while True:
+    l = lex.next()
+    lexemes.append((l.type, l.data, l.loc.lineno))
+    if l.type == P.LexemeType.EOF:
+      return lexemes
+
+def test_goal():
+  assert _lex('|Goal  // !3, ?1  # comment\n   |[X] Check\n') == [
+    (P.LexemeType.GOAL, (0, 'Goal'), 1),
+    (P.LexemeType.ATTR_START, None, 1),
+    (P.LexemeType.LIST_ELT, '!3', 1),
+    (P.LexemeType.COMMA, ',', 1),
+    (P.LexemeType.LIST_ELT, '?1', 1),
+    (P.LexemeType.CHECK, (3, 'X', 'Check'), 2),
+    (P.LexemeType.EOF, '', 2)]
+
+def test_edge():
+  assert _lex('\n|<-  // @a/b (c), 1h-2d (1d, 10%)\n') == [
+    (P.LexemeType.LARROW, 0, 2),
+    (P.LexemeType.ATTR_START, None, 2),
+    (P.LexemeType.LIST_ELT, '@a/b (c)', 2),
+    (P.LexemeType.COMMA, ',', 2),
+    (P.LexemeType.LIST_ELT, '1h-2d (1d, 10%)', 2),
+    (P.LexemeType.EOF, '', 2)]
+
+def test_project_attr():
+  assert _lex('members = a (0.5), b\n') == [
+    (P.LexemeType.PRJ_ATTR, 'members', 1),
+    (P.LexemeType.ASSIGN, None, 1),
+    (P.LexemeType.LIST_ELT, 'a (0.5)', 1),
+    (P.LexemeType.COMMA, ',', 1),
+    (P.LexemeType.LIST_ELT, 'b', 1),
+    (P.LexemeType.EOF, '', 1)]
+
+def test_sched():
+  assert _lex('-- // @a\n  || \n') == [
+    (P.LexemeType.SCHED, (0, '--'), 1),
+    (P.LexemeType.ATTR_START, None, 1),
+    (P.LexemeType.LIST_ELT, '@a', 1),
+    (P.LexemeType.SCHED, (2, '||'), 2),
+    (P.LexemeType.EOF, '', 2)]
+
+def test_buffer(tmp_path):
+  text = '|Goal  // !3  # comment\n\n|<-\n  |Ünicode goal\n'
+  lines = _lex(text)
+  f = tmp_path / 'plan.txt'
+  f.write_text(text, encoding='utf-8')
+  with platform.map_file(str(f)) as buf:
+    lex = P.Lexer()
+    lex.reset(str(f), buf)
+    lexemes = []
+    while True:
+      l = lex.next()
+      lexemes.append((l.type, l.data, l.loc.lineno))
+      if l.type == P.LexemeType.EOF:
+        break
+  assert lexemes == lines
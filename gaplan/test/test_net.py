@@ -0,0 +1,188 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2022 Yury Gribov
+#
+# Use of this source code is governed by The MIT License (MIT)
+# that can be found in the LICENSE.txt file.
+
+import sys
+
+import pytest
+
+from gaplan.bench import synth
+
+from helpers import parse_net
+
+def _recursive_visit(g, visited, events, hierarchical):
+  if g.name in visited:
+    return
+  visited.add(g.name)
+  events.append(('enter', g.name))
+  if hierarchical:
+    nexts = g.children
+  else:
+    nexts = [a.head for a in g.preds if a.head] + [a.tail for a in g.succs if a.tail]
+  for h in nexts:
+    _recursive_visit(h, visited, events, hierarchical)
+  events.append(('exit', g.name))
+
+def test_visit_order():
+  net = parse_net(synth.generate(goals=100, components=3, fanin=2))
+  for hierarchical in (False, True):
+    expected = []
+    visited = set()
+    for root in net.roots:
+      _recursive_visit(root, visited, expected, hierarchical)
+    events = []
+    net.visit_goals(before=lambda g: events.append(('enter', g.name)),
+                    after=lambda g: events.append(('exit', g.name)),
+                    hierarchical=hierarchical)
+    assert events == expected
+    pre = [g.name for g in net.iter_goals(hierarchical=hierarchical)]
+    assert pre == [name for ev, name in expected if ev == 'enter']
+    post = [g.name for g in net.iter_goals('post', hierarchical=hierarchical)]
+    assert post == [name for ev, name in expected if ev == 'exit']
+
+def test_early_exit():
+  net = parse_net(synth.generate(goals=100))
+  for i, g in enumerate(net.iter_goals()):
+    if i == 10:
+      break
+  assert len(list(net.iter_goals(roots=[g], preds=False, succs=False))) == 1
+
+def test_deep_net():
+  depth = 3 * sys.getrecursionlimit()
+  lines = []
+  for i in range(depth):
+    lines.append(f'|Goal {i}\n')
+    lines.append(f'|<-\n')
+    lines.append(f'   |Goal {i + 1}\n')
+  net = parse_net(''.join(lines))
+  assert len(net.goals) == depth + 1
+  g0 = net.name_to_goal['Goal 0']
+  post = list(net.iter_goals('post', roots=[g0], succs=False))
+  assert [g.name for g in post] == [f'Goal {i}' for i in range(depth, -1, -1)]
+
+def test_nested_global_deps():
+  net = parse_net('''\
+|A
+|<-  // global
+   |B
+   |[] Check
+   |<-  // 1h
+      |C
+''')
+  a, b, c = (net.name_to_goal[name] for name in 'ABC')
+  # B is only reachable hierarchically (as A's child)
+  assert b.parent is a
+  assert net.goals == [a, b, c]
+  assert [g.index for g in net.goals] == [0, 1, 2]
+  assert [g.depth for g in net.goals] == [0, 1, 2]
+  assert [g.name for g in net.iter_goals(hierarchical=True)] == ['A', 'B', 'C']
+
+def test_cycles():
+  net = parse_net('''\
+|A
+|<-
+   |B
+   |<-
+      |C
+      |<-
+         |A
+|D
+|<-
+   |D
+|E
+|<-
+   |C
+''')
+  cycles = [sorted(g.name for g in scc) for scc in net.find_cycles()]
+  assert sorted(cycles) == [['A', 'B', 'C'], ['D']]
+  assert not parse_net(synth.generate(goals=100, fanin=2)).find_cycles()
+  with pytest.raises(SystemExit):
+    net.check(1)
+
+def test_cycles_global():
+  # B is only reachable via global dependency so it's not part of network
+  net = parse_net('''\
+|A
+|<- // global
+   |B
+|<- // 1h
+   |C
+''')
+  assert [g.name for g in net.goals] == ['A', 'C']
+  assert not net.find_cycles()
+  assert [h.name for h in net.pred_goals(net.name_to_goal['A'])] == ['C']
+
+def test_propagate():
+  net = parse_net('''\
+|A  // !3, I2
+|<-
+   |B
+   |<-
+      |C
+|D  // !2, I1
+|<-
+   |C
+   |<-
+      |E  // !1
+''')
+  prio = {name: g.prio for name, g in net.name_to_goal.items()}
+  assert prio == {'A': 3, 'B': 3, 'C': 3, 'D': 2, 'E': 3}
+  iters = {name: g.iter for name, g in net.name_to_goal.items()}
+  assert iters == {'A': 2, 'B': 2, 'C': 1, 'D': 1, 'E': 1}
+
+def test_slice():
+  net = parse_net('''\
+|A
+|<-  // global
+   |G
+|<-
+   |B
+   |<-
+      |C
+      |<-
+         |D
+         |<-
+            |E
+|F
+|<-
+   |E
+|G
+''')
+  c = net.name_to_goal['C']
+  assert sorted(g.name for g in net.slice(c)) == ['A', 'B', 'C', 'D', 'E', 'G']
+  assert sorted(g.name for g in net.slice(c, 1)) == ['A', 'B', 'C', 'D', 'G']
+  assert sorted(g.name for g in net.slice(c, 0)) == ['A', 'B', 'C']
+  sub = net.subnet(net.slice(c, 1))
+  assert sorted(sub.name_to_goal) == ['A', 'B', 'C', 'D', 'G']
+
+def test_content_hash():
+  text = '''\
+|A  // !2
+|<-  // 1d, @dev1
+   |B
+   |[] Check 1
+   |<-
+      |C
+
+|D
+|<-
+   |E
+'''
+  net = parse_net(text)
+  h = net.compute_hashes()
+  assert h == parse_net(text).compute_hashes()
+  hashes = {name: g.content_hash for name, g in net.name_to_goal.items()}
+
+  # Locations do not matter
+  net2 = parse_net('\n\n' + text.replace('!2', ' !2'))
+  net2.compute_hashes()
+  assert hashes == {name: g.content_hash for name, g in net2.name_to_goal.items()}
+
+  # Changes propagate to ancestors
+  net3 = parse_net(text.replace('[] Check', '[X] Check'))
+  assert net3.compute_hashes() != h
+  changed = {name for name, g in net3.name_to_goal.items() if g.content_hash != hashes[name]}
+  assert changed == {'A', 'B'}
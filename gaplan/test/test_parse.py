@@ -5,14 +5,78 @@
 # Use of this source code is governed by The MIT License (MIT)
 # that can be found in the LICENSE.txt file.
 
+import datetime
+import sys
+import threading
+
 import pytest
 
 import gaplan.common.parse as PA
+from gaplan.common.location import Location
+import gaplan.parse as P
 
 def test_read_effort():
   d, rest = PA.read_effort('0.5d___', None)
   assert d == 4 and rest == '___'
 
+def test_read_effort_error(capsys):
+  with pytest.raises(SystemExit):
+    PA.read_effort('1x', Location('plan.txt', 3))
+  assert 'plan.txt:3: failed to parse effort: 1x' in capsys.readouterr().err
+
 def test_read_effort2():
   d = PA.read_eta('0.5d-1w (10%, 2d)', None)
   assert d.min == 4 and d.max == 40 and d.real == 16 and abs(d.completion - 0.1) < 0.01
+
+def test_threads():
+  errors = []
+  def work(i):
+    for _ in range(200):
+      d = PA.read_eta(f'{i}h-{i + 1}h ({i}0%)', None)
+      if d.min != i or abs(d.completion - i / 10) > 0.01:
+        errors.append(i)
+      alloc, _ = PA.read_alloc(f'@dev{i}', None)
+      if alloc != [f'dev{i}']:
+        errors.append(i)
+  threads = [threading.Thread(target=work, args=(i,)) for i in range(1, 9)]
+  for t in threads:
+    t.start()
+  for t in threads:
+    t.join()
+  assert not errors
+
+def test_read_date():
+  for s, d, rest in [('2020-01-10', datetime.date(2020, 1, 10), ''),
+                     (' 2020-1-5 xyz', datetime.date(2020, 1, 5), 'xyz'),
+                     ('2020-02', datetime.date(2020, 2, 1), ''),
+                     ('2020-01-10 - 2020-02-01', datetime.date(2020, 1, 10), '- 2020-02-01')]:
+    assert PA.read_date(s, None) == (d, rest)
+  iv = PA.read_date2('2020-01-10 - 2020-01-12', None)
+  assert iv.start == datetime.date(2020, 1, 10) and iv.finish == datetime.date(2020, 1, 13)
+
+def test_memoization():
+  PA.clear_caches()
+  a = PA.read_eta('1d-2d (50%)', None)
+  b = PA.read_eta('1d-2d (50%)', None)
+  assert a is not b and (a.min, a.max, a.completion) == (b.min, b.max, b.completion)
+  alloc, _ = PA.read_alloc('@dev1/dev2', None)
+  alloc.append('dev3')
+  assert PA.read_alloc('@dev1/dev2', None) == (['dev1', 'dev2'], [])
+  assert PA._parse_eta.cache_info().hits == 1
+
+def test_deep_nesting():
+  depth = 3 * sys.getrecursionlimit()
+  lines = []
+  for i in range(depth):
+    ind = ' ' * (3 * i)
+    lines.append(f'{ind}|Goal {i}\n')
+    lines.append(f'{ind}|<-  // 1h\n')
+  parser = P.Parser()
+  parser.reset('deep.txt', iter(lines))
+  unit = parser.parse_unit()
+  assert len(unit.roots) == 1
+  g = unit.roots[0]
+  for i in range(depth - 1):
+    assert g.name == f'Goal {i}' and len(g.preds) == 1
+    g = g.preds[0].head
+  assert g.name == f'Goal {depth - 1}' and g.preds[0].head.dummy
@@ -0,0 +1,52 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2022 Yury Gribov
+#
+# Use of this source code is governed by The MIT License (MIT)
+# that can be found in the LICENSE.txt file.
+
+import pytest
+
+from gaplan.bench import synth
+from gaplan.goal import walk_goals
+import gaplan.rollup as R
+
+from helpers import parse_net
+
+def test_shared_deps():
+  # D is needed for both B and C but must be counted once
+  net = parse_net('''\
+|A
+|<-  // 1h
+   |B
+   |<-  // 2h
+      |D
+      |<-  // 8h (1h, 50%)
+|A
+|<-  // 1h
+   |C
+   |[X] Done
+   |<-  // 4h
+      |D
+''')
+  rollup = R.of(net)
+  assert rollup is R.of(net)
+  goal = net.name_to_goal
+  assert rollup.closure(goal['D']).estimate == 8
+  assert rollup.closure(goal['D']).done == 4
+  assert rollup.closure(goal['C']).estimate == 12
+  assert rollup.closure(goal['C']).done == 8
+  total = rollup.closure(goal['A'])
+  assert (total.min, total.estimate, total.done, total.remaining) == (16, 16, 8, 8)
+  assert total.goals == 5  # Including dummy goal
+  assert total.progress == 1
+  assert rollup.total().estimate == 16
+
+def test_closure():
+  net = parse_net(synth.generate(goals=300, fanin=2))
+  rollup = R.of(net)
+  for g in net.goals[::10]:
+    deps = [h for h, _ in walk_goals([g], set(), succs=False)]
+    expected = sum(rollup.goal(h).estimate for h in deps)
+    assert rollup.closure(g).goals == len(deps)
+    assert rollup.closure(g).estimate == pytest.approx(expected)
@@ -0,0 +1,67 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2022 Yury Gribov
+#
+# Use of this source code is governed by The MIT License (MIT)
+# that can be found in the LICENSE.txt file.
+
+import os
+import sys
+
+import gaplan.parse as P
+from gaplan.common.printers import SourcePrinter
+import gaplan.wbs as WBS
+
+def test_descendant_deps():
+  parser = P.Parser()
+  parser.reset('test.txt', '''\
+|A
+|<-  // 1d
+   |B
+   |<-
+      |C
+      |<-  // 2h
+         |D
+''')
+  net, _, _ = parser.parse(0)
+  wbs = WBS.create_wbs(net, True)
+  milestones = []
+  wbs.visit_tasks(lambda t: milestones.extend(t.milestones))
+  # Instant dependency of B on it's child C is redundant
+  assert not milestones
+
+def test_global_deps():
+  parser = P.Parser()
+  parser.reset('test.txt', '''\
+|A
+|<-  // global
+   |B
+|<-  // 1h
+   |C
+''')
+  net, _, _ = parser.parse(0)
+  wbs = WBS.create_wbs(net, True)
+  # B is only reachable via global dependency so it's not part of WBS
+  deps = {}
+  wbs.visit_tasks(lambda t: deps.update({t.name: t.depends}))
+  assert deps == {'A': [], 'Implementation 1': ['id_1'], 'C': []}
+
+def test_deep_plan():
+  depth = 2 * sys.getrecursionlimit()
+  lines = []
+  for i in range(depth):
+    indent = '   ' * i
+    lines.append(f'{indent}|Goal {i}\n')
+    lines.append(f'{indent}|<-  // 1h\n')
+  lines.append('   ' * depth + f'|Goal {depth}\n')
+  parser = P.Parser()
+  parser.reset('test.txt', ''.join(lines))
+  net, _, _ = parser.parse(0)
+  wbs = WBS.create_wbs(net, True)
+  # Goals form a chain of subtasks
+  task, = wbs.tasks
+  for i in range(depth):
+    assert task.name == f'Goal {i}'
+    task, = task.subtasks
+  with open(os.devnull, 'w') as f:
+    wbs.dump(SourcePrinter(f))
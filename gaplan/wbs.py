@@ -97,27 +97,33 @@ class Task:
         setattr(task, attr, getattr(self, attr))
 
   def dump(self, p):
-    p.writeln(f"Task {self.id} \"{self.pretty_name()}\"")
-    with p:
-      if self.goal:
-        p.writeln(f"Goal \"{self.goal.name}\"")
-      if self.act:
-        self.act.dump(p)
-      if self.activities:
-        p.writeln("Activities")
-        with p:
-          for task in self.activities:
-            task.dump(p)
-      if self.milestones:
-        p.writeln("Milestones")
-        with p:
-          for task in self.milestones:
-            task.dump(p)
-      if self.subtasks:
-        p.writeln("Subtasks")
-        with p:
-          for task in self.subtasks:
-            task.dump(p)
+    # Iterative to support deep hierarchies: stack contains tasks
+    # and headers of nested blocks, None marks end of block
+    stack = [self]
+    while stack:
+      item = stack.pop()
+      if item is None:
+        p.exit()
+        continue
+      if isinstance(item, str):
+        p.writeln(item)
+        p.enter()
+        continue
+      task = item
+      p.writeln(f"Task {task.id} \"{task.pretty_name()}\"")
+      p.enter()
+      stack.append(None)
+      if task.goal:
+        p.writeln(f"Goal \"{task.goal.name}\"")
+      if task.act:
+        task.act.dump(p)
+      for header, tasks in (("Subtasks", task.subtasks),
+                            ("Milestones", task.milestones),
+                            ("Activities", task.activities)):
+        if tasks:
+          stack.append(None)
+          stack.extend(reversed(tasks))
+          stack.append(header)
 
 class WBS:
   """Represents Work Breakdown Structure generated from declarative plan."""
@@ -136,17 +142,14 @@ class WBS:
         task.dump(p)
 
   def visit_tasks(self, cb):
-    """Visitor pattern for task hierarchy."""
-    def visit(task):
+    """Visitor pattern for task hierarchy (tasks are visited in preorder)."""
+    stack = list(reversed(self.tasks))
+    while stack:
+      task = stack.pop()
       cb(task)
-      for t in task.activities:
-        visit(t)
-      for t in task.milestones:
-        visit(t)
-      for t in task.subtasks:
-        visit(t)
-    for task in self.tasks:
-      visit(task)
+      stack.extend(reversed(task.subtasks))
+      stack.extend(reversed(task.milestones))
+      stack.extend(reversed(task.activities))
 
 def _is_goal_ignored(g):
   return g.dummy and not g.preds
@@ -162,8 +165,9 @@ def _create_goal_task(goal, parent, ids):
 
   task = Task(id, goal.name, parent, goal=goal)
 
+  # Goals which are only reachable via global deps are not part of WBS
   for act in goal.global_preds:
-    if act.head:
+    if act.head and act.head.name in ids:
       task.depends.add(act.head.name)
 
   task_num = 1
@@ -202,10 +206,11 @@ def _create_wbs_iterative(net, ids):
 
   return WBS(tasks)
 
-def _create_goal_task_hierarchical(goal, parent, ids, ancestors):
+def _create_goal_task_hierarchical(goal, parent, ids):
   id = ids[goal.name]
   task = Task(id, goal.name, parent, goal=goal)
-  task.depends.update(a.head.name for a in goal.global_preds if a.head)
+  task.depends.update(a.head.name for a in goal.global_preds
+                      if a.head and a.head.name in ids)
 
   # Creation of deps is a bit complicated here.
   # In general we can _not_ copy goal deps into parent task
@@ -227,27 +232,27 @@ def _create_goal_task_hierarchical(goal, parent, ids, ancestors):
       task_num += 1
       task.activities.append(t)
 
-  for g in goal.children:
-    t = _create_goal_task_hierarchical(g, task, ids, ancestors)
-    task.subtasks.append(t)
-
   return task
 
-def _create_wbs_hierarchical(net, ids, ancestors):
+def _create_wbs_hierarchical(net, ids):
   tasks = []
   for g in net.roots:
-    task = _create_goal_task_hierarchical(g, None, ids, ancestors)
+    task = _create_goal_task_hierarchical(g, None, ids)
     tasks.append(task)
+    # Subtasks are created iteratively to support deep hierarchies
+    stack = [(g, task)]
+    while stack:
+      goal, task = stack.pop()
+      for child in goal.children:
+        t = _create_goal_task_hierarchical(child, task, ids)
+        task.subtasks.append(t)
+        stack.append((child, t))
   return WBS(tasks)
 
-def _optimize_task(task, ancestors):
+def _optimize_task(task, net):
   """Try to optimize structure of WBS
-     by removing various dummy subtasks."""
-
-  # Optimize kids
-
-  for t in task.subtasks:
-    _optimize_task(t, ancestors)
+     by removing various dummy subtasks
+     (subtasks should already be optimized)."""
 
   logger.debug(f"_optimize_task: optimizing task {task.id} ({task.name})")
 
@@ -272,15 +277,16 @@ def _optimize_task(task, ancestors):
     else:
       task.subtasks.append(t)
 
-  # Drop instant deps from ancestors.
+  # Drop instant deps on descendants (task can not complete before them anyway).
 
-  def is_ancestor(name):
-    return name in ancestors[task.name]
+  def is_descendant(name):
+    g = net.name_to_goal.get(name)
+    return task.goal is not None and g is not None and net.is_ancestor(task.goal, g)
 
   old_milestones = task.milestones
   task.milestones = []
   for t in old_milestones:
-    external_deps = list(filter(lambda t: not is_ancestor(t), t.depends))
+    external_deps = list(filter(lambda t: not is_descendant(t), t.depends))
     if external_deps:
       task.milestones.append(t)
     else:
@@ -314,34 +320,33 @@ def _optimize_task(task, ancestors):
 def create_wbs(net, hierarchy):
   """Generate WBS from declarative plan."""
 
-  next_id = [0]  # Python's craziness
+  next_id = 0
   ids = {}
-  def assign_id(g):
+  for g in net.goals:
     if g.name not in ids:
       if g.id is not None:
         ids[g.name] = g.id
       else:
-        ids[g.name] = f'id_{next_id[0]}'
-        next_id[0] += 1
-  net.visit_goals(callback=assign_id)
-
-  ancestors = {}
-  def cache_ancestors(goal):
-    ancestors[goal.name] = set()
-    for g in goal.children:
-      ancestors[g.name].add(g.name)
-      ancestors[g.name].update(ancestors[g.name])
-  net.visit_goals(after=cache_ancestors, hierarchical=True)
+        ids[g.name] = f'id_{next_id}'
+        next_id += 1
 
   if hierarchy:
-    wbs = _create_wbs_hierarchical(net, ids, ancestors)
+    wbs = _create_wbs_hierarchical(net, ids)
   else:
     wbs = _create_wbs_iterative(net, ids)
 
   wbs.check()
 
-  for task in wbs.tasks:
-    _optimize_task(task, ancestors)
+  # Optimize kids before parents
+
+  postorder = []
+  stack = list(wbs.tasks)
+  while stack:
+    task = stack.pop()
+    postorder.append(task)
+    stack.extend(task.subtasks)
+  for task in reversed(postorder):
+    _optimize_task(task, net)
 
   wbs.check()
 
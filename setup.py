@@ -22,6 +22,9 @@ setuptools.setup(
   long_description_content_type='text/markdown',
   url='https://github.com/yugr/gaplan',
   packages=setuptools.find_packages(exclude=['test']),
+  extras_require={
+    'numpy': ['numpy'],
+  },
   classifiers=[
     'Programming Language :: Python :: 3',
     'License :: OSI Approved :: MIT License',